@@ -0,0 +1,275 @@
+# Allocation budgets for the steady-state loop. Every heap allocation
+# brings a GC pause (a visible stutter in the 100 Hz flicker) closer,
+# so the state functions the executive calls over and over should
+# allocate as little as possible, ideally nothing. This runs code.py's
+# machines, measures what each dispatch allocates, per (machine, state)
+# as in stateprof.py, and fails if the worst dispatch after the warm up
+# goes over the state's budget in BUDGETS.
+#
+# On the host, on the sim/ stand-in hardware, with tracemalloc doing
+# the counting:
+#
+#   python allocbudget.py [--seconds N] [--warmup N] [--json FILE]
+#
+# CPython allocates where CircuitPython doesn't (ints over 256 are
+# objects), so the host budgets are for catching changes, not the
+# board's numbers. On the board (copy this file over, then from the
+# REPL) gc.mem_alloc() does the counting, with the collector off:
+#
+#   >>> import allocbudget
+#   >>> allocbudget.main()
+
+import gc
+import sys
+import time
+
+import stateprof
+
+try:
+    import tracemalloc
+except ImportError:
+    # On the board
+    tracemalloc = None
+
+# Worst bytes allocated by one dispatch, after the warm up. A state
+# that runs without a budget (None, or not listed) fails the check, so
+# the numbers measured for it can be filled in. Every dispatch
+# allocates at least the (next state, trigger) tuple it returns: 64
+# bytes on the host, one 16 byte GC block on the board. auto_on and
+# auto_off also make a bound method (of self.auto_poll), another block.
+# On the board that's all the steady states should allocate, the
+# flicker's included (whichever TABLE_FLICKER picks; regenerating a
+# waveform chunk is small int arithmetic); GPS.poll and enter_automatic
+# are still to be measured there. On the host BigFlicker.flicker's
+# colour ints and TableFlicker.on's chunks show up, and
+# enter_automatic runs at each transition rather than every tick (the
+# first one each day builds solarcache's darkness index and saves a new
+# persist record), so their budgets are looser.
+BUDGETS = {
+    "host": {
+        "GPS.poll": 1024,
+        "Control.wait_on_gps": 64,
+        "Control.auto_poll": 64,
+        "Control.enter_automatic": 6144,
+        "Control.auto_on": 64,
+        "Control.auto_off": 64,
+        "BigFlicker.flicker": 256,
+        "BigFlicker.dark": 64,
+        "TableFlicker.on": 512,
+        "TableFlicker.off": 64,
+    },
+    "board": {
+        "GPS.poll": None,
+        "Control.wait_on_gps": 16,
+        "Control.auto_poll": 16,
+        "Control.enter_automatic": None,
+        "Control.auto_on": 32,
+        "Control.auto_off": 32,
+        "BigFlicker.flicker": 16,
+        "BigFlicker.dark": 16,
+        "TableFlicker.on": 16,
+        "TableFlicker.off": 16,
+    },
+}
+
+# Where and when the host run is: just before sunset, so the lamp
+# comes on during the run
+START = 1704145200 # 2024-01-01T21:40:00Z
+LATITUDE = 40.0
+LONGITUDE = -75.0
+
+class HostCounter:
+    "Bytes allocated (high water mark) across a call, with tracemalloc"
+
+    def __init__(self):
+        tracemalloc.start()
+        self._start = 0
+        self.overhead = 0
+        self.overhead = self.calibrate()
+
+    def start(self):
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        return tracemalloc.get_traced_memory()[1] - self._start - self.overhead
+
+    def calibrate(self):
+        # What start()/stop() allocate themselves
+        self.start()
+        return self.stop()
+
+    def close(self):
+        tracemalloc.stop()
+
+class BoardCounter:
+    "Bytes allocated across a call, from gc.mem_alloc() with the collector off"
+
+    def __init__(self):
+        gc.collect()
+        gc.disable()
+        self._start = 0
+        self.overhead = 0
+        self.overhead = self.calibrate()
+
+    def start(self):
+        if gc.mem_free() < 4096:
+            gc.collect()
+        self._start = gc.mem_alloc()
+
+    def stop(self):
+        return gc.mem_alloc() - self._start - self.overhead
+
+    def calibrate(self):
+        self.start()
+        return self.stop()
+
+    def close(self):
+        gc.enable()
+
+class Done(Exception):
+    pass
+
+class AllocationProfiler(stateprof.Profiler):
+    """stateprof.Profiler that measures what each dispatch allocates
+    instead of how long it takes. Dispatches before warmup_end (ns)
+    aren't counted, and the first one after end (ns) raises Done to
+    get out of the executive.
+    """
+
+    def __init__(self, counter, warmup_end, end, size=24):
+        stateprof.Profiler.__init__(self, size)
+        self.counter = counter
+        self.warmup_end = warmup_end
+        self.end = end
+        self.measured = [0] * size
+        self.total_bytes = [0] * size
+        self.max_bytes = [0] * size
+
+    def _dispatch(self, wrapper, now):
+        if now > self.end:
+            raise Done()
+        counter = self.counter
+        counter.start()
+        next_state, trigger = wrapper.state(now)
+        allocated = counter.stop()
+
+        slot = wrapper.slot
+        if slot < 0:
+            self.overflow += 1
+        elif now >= self.warmup_end:
+            self.measured[slot] += 1
+            self.total_bytes[slot] += allocated
+            if allocated > self.max_bytes[slot]:
+                self.max_bytes[slot] = allocated
+
+        if next_state is not None:
+            next_state = self._wrap(wrapper.machine, next_state)
+        return next_state, trigger
+
+    def results(self):
+        "{state: (dispatches, mean bytes, max bytes)} of the ones measured"
+        results = {}
+        for slot, name in enumerate(self.names):
+            n = self.measured[slot]
+            if n:
+                results[name] = (n, self.total_bytes[slot] / n, self.max_bytes[slot])
+        return results
+
+def check(results, budgets):
+    "Failure messages for the states over budget, or without one"
+    failures = []
+    for name, (n, mean, worst) in sorted(results.items()):
+        budget = budgets.get(name)
+        if budget is None:
+            failures.append(f"{name}: {worst} bytes in one dispatch, no budget set")
+        elif worst > budget:
+            failures.append(f"{name}: {worst} bytes in one dispatch, budget {budget}")
+    return failures
+
+def report(results, budgets, failures):
+    print(f"{'state':<24} {'dispatches':>10} {'mean B':>8} {'max B':>8} {'budget':>8}")
+    for name, (n, mean, worst) in sorted(results.items()):
+        budget = budgets.get(name)
+        print(f"{name:<24} {n:>10} {mean:>8.1f} {worst:>8} {'-' if budget is None else budget:>8}")
+    for name in sorted(budgets):
+        if name not in results:
+            print(f"{name:<24} {'not run':>10}")
+    for failure in failures:
+        print("FAIL:", failure)
+
+def run_host(seconds, warmup):
+    import contextlib
+    import os
+
+    from sim import machines
+    from sim.clock import VirtualClock, VirtualRTC
+    from sim.hardware import install
+    from sim.uart import ReceiverUART
+
+    clock = VirtualClock()
+    hardware = install(clock, VirtualRTC(clock, time.gmtime(START)))
+    hardware.uarts.append(ReceiverUART(clock, START, LATITUDE, LONGITUDE))
+    end = int(seconds * machines.SECONDS_PER_NS)
+    machines.configure(clock, end)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        code = hardware.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), "code.py"),
+                             "chalice_code")
+        counter = HostCounter()
+        try:
+            profiler = AllocationProfiler(counter, int(warmup * machines.SECONDS_PER_NS), end)
+            machines.register_machine(*(profiler.machine(machine) for machine in code.setup()))
+            machines.run()
+        finally:
+            counter.close()
+    return profiler.results()
+
+def run_board(seconds, warmup):
+    import code
+    import statemachines
+
+    machines = code.setup()
+    counter = BoardCounter()
+    try:
+        start = time.monotonic_ns()
+        profiler = AllocationProfiler(counter,
+                                      start + int(warmup * statemachines.SECONDS_PER_NS),
+                                      start + int(seconds * statemachines.SECONDS_PER_NS))
+        statemachines.register_machine(*(profiler.machine(machine) for machine in machines))
+        try:
+            statemachines.run(())
+        except Done:
+            pass
+    finally:
+        counter.close()
+    return profiler.results()
+
+def main(seconds=900, warmup=10, json_path=None):
+    """Run for seconds (simulated on the host), measuring after warmup.
+    Returns 0 if everything is within budget, 1 if not.
+    """
+    if tracemalloc is not None:
+        platform, results = "host", run_host(seconds, warmup)
+    else:
+        platform, results = "board", run_board(seconds, warmup)
+
+    budgets = BUDGETS[platform]
+    failures = check(results, budgets)
+    report(results, budgets, failures)
+
+    if json_path is not None:
+        import json
+        with open(json_path, "w") as f:
+            json.dump({"platform": platform, "seconds": seconds, "warmup": warmup,
+                       "results": results, "budgets": budgets, "failures": failures}, f, indent=1)
+    return 1 if failures else 0
+
+if __name__ == "__main__" and tracemalloc is not None:
+    import argparse
+    parser = argparse.ArgumentParser(description="check code.py's per-dispatch allocation budgets")
+    parser.add_argument("--seconds", type=float, default=900, help="simulated seconds to run")
+    parser.add_argument("--warmup", type=float, default=10, help="seconds before measuring")
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args()
+    sys.exit(main(args.seconds, args.warmup, args.json))
@@ -128,10 +128,14 @@ def _ord2ymd(n):
     return year, month, n+1
 
 class Date:
+    # Stored as the proleptic Gregorian ordinal, which is all that
+    # comparisons and arithmetic need. year/month/day are only worked
+    # out (and then kept) if someone asks for them.
+    __slots__ = ('_ordinal', '_ymd')
+
     def __init__(self, year, month, day):
-        self._year = year
-        self._month = month
-        self._day = day
+        self._ordinal = _ymd2ord(year, month, day)
+        self._ymd = (year, month, day)
 
     @classmethod
     def fromtimestamp(cls, timestamp):
@@ -143,53 +147,78 @@ class Date:
         January 1 of year 1 is day 1.  Only the year, month and day are
         non-zero in the result.
         """
-        y, m, d = _ord2ymd(n)
-        return cls(y, m, d)
+        self = cls.__new__(cls)
+        self._ordinal = n
+        self._ymd = None
+        return self
+
+    def _fields(self):
+        ymd = self._ymd
+        if ymd is None:
+            ymd = self._ymd = _ord2ymd(self._ordinal)
+        return ymd
 
     @property
     def year(self):
         """year (1-9999)"""
-        return self._year
+        return self._fields()[0]
 
     @property
     def month(self):
         """month (1-12)"""
-        return self._month
+        return self._fields()[1]
 
     @property
     def day(self):
         """day (1-31)"""
-        return self._day
+        return self._fields()[2]
     
     def toordinal(self):
         """Return proleptic Gregorian ordinal for the year, month and day.
         January 1 of year 1 is day 1.  Only the year, month and day values
         contribute to the result.
         """
-        return _ymd2ord(self._year, self._month, self._day)
+        return self._ordinal
 
     def tomarrow(self):
-        ordinal = self.toordinal() + 1
-        return self.fromordinal(ordinal)
+        return self.fromordinal(self._ordinal + 1)
 
     def yesterday(self):
-        ordinal = self.toordinal() - 1
-        return self.fromordinal(ordinal)
+        return self.fromordinal(self._ordinal - 1)
+
+    def __add__(self, days):
+        "date + days -> date"
+        return self.fromordinal(self._ordinal + days)
 
     def __sub__(self, b):
-        return self.toordinal() - b.toordinal()
+        "date - days -> date, date - date -> days"
+        if isinstance(b, int):
+            return self.fromordinal(self._ordinal - b)
+        return self._ordinal - b._ordinal
 
     def __str__(self):
-        return "%4d-%02d-%02d" % (self._year, self._month, self._day)
+        return "%4d-%02d-%02d" % self._fields()
+
+    def __hash__(self):
+        return hash(self._ordinal)
 
     def __gt__(self, other):
-        return self.toordinal() > other.toordinal()
+        return self._ordinal > other._ordinal
 
     def __lt__(self, other):
-        return self.toordinal() < other.toordinal()
+        return self._ordinal < other._ordinal
+
+    def __ge__(self, other):
+        return self._ordinal >= other._ordinal
+
+    def __le__(self, other):
+        return self._ordinal <= other._ordinal
 
     def __eq__(self, other):
-        return self.toordinal() == other.toordinal()
+        return self._ordinal == other._ordinal
+
+    def __ne__(self, other):
+        return self._ordinal != other._ordinal
 
 def excel_datediff(start_date, end_date):
     """Return the same number of days between 2 dates as Excel does"""
@@ -200,17 +229,35 @@ SECS_PER_DAY = 24 * 60 * 60
 class DateSeconds:
     """Like DateTime, but just seconds since midnight for the time instead of hours, minutes, seconds."""
 
-    def __init__(self, date, seconds):
-        while seconds >= SECS_PER_DAY:
-            seconds -= SECS_PER_DAY
-            date = date.tomarrow()
+    # Stored as a day ordinal and seconds into that day (rather than
+    # the single number toordinal() returns) so everything stays a
+    # small int on CircuitPython. The Date is only built on demand.
+    __slots__ = ('_days', '_seconds', '_date')
 
-        while seconds < 0:
-            seconds += SECS_PER_DAY
-            date = date.yesterday()
+    def __init__(self, date, seconds):
+        if 0 <= seconds < SECS_PER_DAY:
+            self._days = date.toordinal()
+            self._seconds = seconds
+            self._date = date
+        else:
+            days, seconds = divmod(seconds, SECS_PER_DAY)
+            self._days = date.toordinal() + days
+            self._seconds = seconds
+            self._date = None
 
+    @classmethod
+    def _fromdays(cls, days, seconds):
+        days_carry, seconds = divmod(seconds, SECS_PER_DAY)
+        self = cls.__new__(cls)
+        self._days = days + days_carry
         self._seconds = seconds
-        self._date = date
+        self._date = None
+        return self
+
+    @classmethod
+    def fromordinal(cls, n):
+        "Inverse of toordinal()"
+        return cls._fromdays(0, n)
 
     @classmethod
     def fromtimestamp(cls, ts):
@@ -220,49 +267,68 @@ class DateSeconds:
 
     @property
     def date(self):
-        return self._date
+        date = self._date
+        if date is None:
+            date = self._date = Date.fromordinal(self._days)
+        return date
 
     @property
     def seconds(self):
         return self._seconds
 
     def toordinal(self):
-        return self._date.toordinal() * SECS_PER_DAY + self._seconds
+        return self._days * SECS_PER_DAY + self._seconds
+
+    def __add__(self, seconds):
+        "date_seconds + seconds -> date_seconds"
+        return self._fromdays(self._days, self._seconds + seconds)
 
     def __sub__(self, b):
-        return self.toordinal() - b.toordinal()
+        "date_seconds - seconds -> date_seconds, date_seconds - date_seconds -> seconds"
+        if isinstance(b, int):
+            return self._fromdays(self._days, self._seconds - b)
+        return (self._days - b._days) * SECS_PER_DAY + self._seconds - b._seconds
     
     def __str__(self):
         return f"{self.date} {self.seconds}"
 
+    def __hash__(self):
+        return hash(self._days * SECS_PER_DAY + self._seconds)
+
     def __gt__(self, other):
-        return self.toordinal() > other.toordinal()
+        return self._days > other._days or (self._days == other._days and self._seconds > other._seconds)
 
     def __lt__(self, other):
-        return self.toordinal() < other.toordinal()
+        return self._days < other._days or (self._days == other._days and self._seconds < other._seconds)
 
     def __ge__(self, other):
-        return self.toordinal() >= other.toordinal()
+        return not self < other
 
     def __le__(self, other):
-        return self.toordinal() <= other.toordinal()
+        return not self > other
 
     def __eq__(self, other):
-        return self.toordinal() == other.toordinal()
+        return self._days == other._days and self._seconds == other._seconds
+
+    def __ne__(self, other):
+        return self._days != other._days or self._seconds != other._seconds
 
 
+class AstralError(Exception):
+    pass
+
 SUN_RISING = 1
 SUN_SETTING = -1
 _NAMED_DEPRESSIONS = {"civil": 6, "nautical": 12, "astronomical": 18}
 
 def _depression(depression):
-    if isinstance(depression, str) or isinstance(depression, ustr):
+    if isinstance(depression, str):
         try:
             return _NAMED_DEPRESSIONS[depression]
         except KeyError:
             raise KeyError(
                 "solar_depression must be either a number "
-                "or one of: %s" % tuple(_NAMED_DEPRESSIONS.keys)
+                "or one of: %s" % (tuple(_NAMED_DEPRESSIONS.keys()),)
             )
     else:
         return float(depression)
@@ -321,6 +387,51 @@ def time_of_last_before(event, t, latitude, longitude):
 
     return event_time
 
+SUNRISE = "sunrise"
+SUNSET = "sunset"
+DAWN = "dawn"
+DUSK = "dusk"
+
+def _event_calcs(events, depression):
+    "events -> list of (event, depression, direction) for _calc_time"
+    twilight = _depression(depression) + 90
+    calcs = []
+    for event in events:
+        if event == SUNRISE:
+            calcs.append((event, 90 + 0.833, SUN_RISING))
+        elif event == SUNSET:
+            calcs.append((event, 90 + 0.833, SUN_SETTING))
+        elif event == DAWN:
+            calcs.append((event, twilight, SUN_RISING))
+        elif event == DUSK:
+            calcs.append((event, twilight, SUN_SETTING))
+        else:
+            raise ValueError("unknown event %s" % event)
+    return calcs
+
+def next_transition(t, latitude, longitude, events=(SUNRISE, SUNSET),
+                    depression='civil', max_days=366):
+    """Return (event_time, event) for the first of events (SUNRISE,
+       SUNSET, DAWN and/or DUSK) strictly after t at the given
+       location, or None if none of them happen in the next max_days
+       days. depression applies to DAWN and DUSK.
+    """
+
+    return Observer(latitude, longitude).next_transition(t, events, depression, max_days)
+
+def solar_day(date, latitude, longitude, depressions=('civil', 'nautical', 'astronomical')):
+    """Calculate all of a day's events in one go, sharing the work
+       between them.
+    :param date:        Date to calculate for.
+    :param latitude:    Latitude - Northern latitudes should be positive
+    :param longitude:   Longitude - Eastern longitudes should be positive
+    :param depressions: Depressions to calculate dawn and dusk for
+    :return: A SolarDay with UTC solar noon, sunrise, sunset and a dawn
+             and dusk per depression, None for each event that doesn't
+             happen on that day.
+    """
+    return Observer(latitude, longitude).solar_day(date, depressions)
+
 def sunrise_utc(date, latitude, longitude):
     """Calculate sunrise time in the UTC timezone.
     :param date:       Date to calculate for.
@@ -424,9 +535,12 @@ def dawn_utc(date, latitude, longitude, depression='civil'):
             raise
 
 
+_JULIANDAY_START_ORDINAL = _ymd2ord(1900, 1, 1)
+
 def _julianday(utc_date):
-    start_date = Date(1900, 1, 1)
-    date_diff = excel_datediff(start_date, utc_date)
+    # Same as excel_datediff(Date(1900, 1, 1), utc_date), without
+    # building a new Date each call.
+    date_diff = utc_date.toordinal() - _JULIANDAY_START_ORDINAL + 2
     jd = date_diff + 2415018.5
 
     return jd
@@ -523,21 +637,75 @@ def _sun_declination(juliancentury):
 
 def _hour_angle(latitude, declination, depression):
     latitude_rad = radians(latitude)
+    return _hour_angle_trig(cos(latitude_rad), tan(latitude_rad), declination, depression)
+
+def _hour_angle_trig(cos_latitude, tan_latitude, declination, depression):
     declination_rad = radians(declination)
     depression_rad = radians(depression)
 
     n = cos(depression_rad)
-    d = cos(latitude_rad) * cos(declination_rad)
-    t = tan(latitude_rad) * tan(declination_rad)
+    d = cos_latitude * cos(declination_rad)
+    t = tan_latitude * tan(declination_rad)
     h = (n / d) - t
 
     HA = acos(h)
     return HA
 
-def _calc_time(depression, direction, date, latitude, longitude):
+# The equation of time and the sun's declination only depend on the
+# day, not on the location or the event being calculated, so keep the
+# last few days' worth in a small fixed size ring. The event searches
+# (time_of_first_after etc.) evaluate the same handful of days over and
+# over, for every event type.
+#
+SOLAR_CACHE_SIZE = 8
+
+_solar_cache_ordinals = [None] * SOLAR_CACHE_SIZE
+_solar_cache_terms = [None] * SOLAR_CACHE_SIZE
+_solar_cache_next = 0
+_solar_cache_hits = 0
+_solar_cache_misses = 0
+
+def _solar_terms(date):
+    "date -> (equation of time, declination) for that day."
+    global _solar_cache_next, _solar_cache_hits, _solar_cache_misses
+
+    ordinal = date.toordinal()
+    for i in range(SOLAR_CACHE_SIZE):
+        if _solar_cache_ordinals[i] == ordinal:
+            _solar_cache_hits += 1
+            return _solar_cache_terms[i]
+
+    _solar_cache_misses += 1
     t = _jday_to_jcentury(_julianday(date))
-    eqtime = _eq_of_time(t)
+    terms = (_eq_of_time(t), _sun_declination(t))
+
+    # Overwrite the oldest entry
+    i = _solar_cache_next
+    _solar_cache_ordinals[i] = ordinal
+    _solar_cache_terms[i] = terms
+    _solar_cache_next = (i + 1) % SOLAR_CACHE_SIZE
+
+    return terms
+
+def solar_cache_stats():
+    "Return (hits, misses) for the per-day solar term cache."
+    return _solar_cache_hits, _solar_cache_misses
+
+def solar_cache_clear():
+    "Empty the per-day solar term cache and reset its counters."
+    global _solar_cache_next, _solar_cache_hits, _solar_cache_misses
+    for i in range(SOLAR_CACHE_SIZE):
+        _solar_cache_ordinals[i] = None
+        _solar_cache_terms[i] = None
+    _solar_cache_next = 0
+    _solar_cache_hits = 0
+    _solar_cache_misses = 0
+
+def _calc_time(depression, direction, date, latitude, longitude):
+    eqtime, solarDec = _solar_terms(date)
+    return _event_time(depression, direction, date, eqtime, solarDec, latitude, longitude)
 
+def _event_time(depression, direction, date, eqtime, solarDec, latitude, longitude):
     # Hack(?) to make solar_noon_utc work
     if (depression == 0):
         hourangle = 0
@@ -548,15 +716,170 @@ def _calc_time(depression, direction, date, latitude, longitude):
         if latitude < -89.8:
             latitude = -89.8
 
-        solarDec = _sun_declination(t)
         hourangle = _hour_angle(latitude, solarDec, depression)
 
         if direction == SUN_SETTING:
             hourangle = -hourangle
 
+    return _utc_time(date, eqtime, hourangle, longitude)
+
+def _utc_time(date, eqtime, hourangle, longitude):
     delta = -longitude - degrees(hourangle)
     timeDiff = 4.0 * delta # minutes
     timeUTC = 720.0 + timeDiff - eqtime # minutes
 
     return DateSeconds(date, int(timeUTC * 60))
 
+class Observer:
+    """A location to calculate events for. The location dependent terms
+    are worked out once, when the Observer is built, so keep one
+    around for as long as the location doesn't change.
+    """
+
+    __slots__ = ('latitude', 'longitude', '_cos_latitude', '_tan_latitude')
+
+    def __init__(self, latitude, longitude):
+        self.latitude = latitude
+        self.longitude = longitude
+
+        if latitude > 89.8:
+            latitude = 89.8
+
+        if latitude < -89.8:
+            latitude = -89.8
+
+        latitude_rad = radians(latitude)
+        self._cos_latitude = cos(latitude_rad)
+        self._tan_latitude = tan(latitude_rad)
+
+    def _event_time(self, depression, direction, date, eqtime, solarDec):
+        # Same as the module level _event_time, for this location
+        if (depression == 0):
+            hourangle = 0
+        else:
+            hourangle = _hour_angle_trig(self._cos_latitude, self._tan_latitude,
+                                         solarDec, depression)
+
+            if direction == SUN_SETTING:
+                hourangle = -hourangle
+
+        return _utc_time(date, eqtime, hourangle, self.longitude)
+
+    def _calc_time(self, depression, direction, date):
+        eqtime, solarDec = _solar_terms(date)
+        try:
+            return self._event_time(depression, direction, date, eqtime, solarDec)
+        except ValueError as exc:
+            if exc.args[0] == "math domain error":
+                raise AstralError(
+                    "Sun never reaches %s degrees below the horizon on this day, "
+                    "at this location." % (depression - 90)
+                )
+            else:
+                raise
+
+    def solar_noon(self, date):
+        "UTC DateSeconds of solar noon on date, see solar_noon_utc"
+        return self._calc_time(0, 0, date)
+
+    def sunrise(self, date):
+        "UTC DateSeconds of sunrise on date, see sunrise_utc"
+        return self._calc_time(90 + 0.833, SUN_RISING, date)
+
+    def sunset(self, date):
+        "UTC DateSeconds of sunset on date, see sunset_utc"
+        return self._calc_time(90 + 0.833, SUN_SETTING, date)
+
+    def dawn(self, date, depression='civil'):
+        "UTC DateSeconds of dawn on date, see dawn_utc"
+        return self._calc_time(_depression(depression) + 90, SUN_RISING, date)
+
+    def dusk(self, date, depression='civil'):
+        "UTC DateSeconds of dusk on date, see dusk_utc"
+        return self._calc_time(_depression(depression) + 90, SUN_SETTING, date)
+
+    def solar_day(self, date, depressions=('civil', 'nautical', 'astronomical')):
+        "See the module level solar_day"
+        eqtime, solarDec = _solar_terms(date)
+
+        # The declination terms of the hour angle are the same for every
+        # depression, and rising/setting only differ in sign.
+        declination_rad = radians(solarDec)
+        d = self._cos_latitude * cos(declination_rad)
+        t = self._tan_latitude * tan(declination_rad)
+
+        noon = _utc_time(date, eqtime, 0, self.longitude)
+        sunrise, sunset = self._rise_set(date, eqtime, d, t, 90 + 0.833)
+
+        dawn = []
+        dusk = []
+        for depression in depressions:
+            rise, set = self._rise_set(date, eqtime, d, t, _depression(depression) + 90)
+            dawn.append(rise)
+            dusk.append(set)
+
+        return SolarDay(date, noon, sunrise, sunset, tuple(depressions), tuple(dawn), tuple(dusk))
+
+    def _rise_set(self, date, eqtime, d, t, depression):
+        # (rising, setting) times for depression, see _hour_angle_trig
+        h = (cos(radians(depression)) / d) - t
+        if h < -1.0 or h > 1.0:
+            return None, None
+
+        hourangle = acos(h)
+        return (_utc_time(date, eqtime, hourangle, self.longitude),
+                _utc_time(date, eqtime, -hourangle, self.longitude))
+
+    def next_transition(self, t, events=(SUNRISE, SUNSET), depression='civil', max_days=366):
+        "See the module level next_transition"
+        calcs = _event_calcs(events, depression)
+
+        # An event for a given (UTC) date happens within 12 hours of that
+        # date's solar noon, so the previous day's events can still be after
+        # t, but nothing earlier can be. All of a day's events are less
+        # than 24 hours apart, so if any event on a day is after t, nothing
+        # on a later day can come before it.
+        date = t.date.yesterday()
+        for _ in range(max_days + 1):
+            eqtime, solarDec = _solar_terms(date)
+
+            best = None
+            for event, depression, direction in calcs:
+                try:
+                    event_time = self._event_time(depression, direction, date,
+                                                  eqtime, solarDec)
+                except ValueError:
+                    # Event doesn't happen on this day at this location
+                    continue
+
+                if t < event_time and (best is None or event_time < best[0]):
+                    best = (event_time, event)
+
+            if best is not None:
+                return best
+
+            date = date.tomarrow()
+
+        return None
+
+class SolarDay:
+    """All of a day's events, as returned by solar_day. Each is a UTC
+    DateSeconds, or None if it doesn't happen that day. dawn and dusk
+    are tuples with an entry per depression in depressions.
+    """
+
+    __slots__ = ('date', 'noon', 'sunrise', 'sunset', 'depressions', 'dawn', 'dusk')
+
+    def __init__(self, date, noon, sunrise, sunset, depressions, dawn, dusk):
+        self.date = date
+        self.noon = noon
+        self.sunrise = sunrise
+        self.sunset = sunset
+        self.depressions = depressions
+        self.dawn = dawn
+        self.dusk = dusk
+
+    def __str__(self):
+        return "%s: noon %s, sunrise %s, sunset %s, dawn %s, dusk %s" % (
+            self.date, self.noon, self.sunrise, self.sunset,
+            ", ".join(str(t) for t in self.dawn), ", ".join(str(t) for t in self.dusk))
@@ -0,0 +1,221 @@
+# Vectorized (NumPy) version of the calculations in astral.py, for
+# generating schedules for many locations and/or many days on a host
+# machine. NumPy is not available under CircuitPython, so this module
+# is never copied to the board.
+#
+# The formulas (and the order of the floating point operations) mirror
+# astral._calc_time and friends exactly, so the results match the
+# scalar functions to the second.
+#
+# Days are given as proleptic Gregorian ordinals (see
+# astral.Date.toordinal) and results are returned in the same
+# timebase as astral.DateSeconds.toordinal(), i.e. ordinal *
+# SECS_PER_DAY + seconds since midnight UTC.
+
+import numpy as np
+
+import astral
+
+SECS_PER_DAY = astral.SECS_PER_DAY
+
+# Excel day number of 1900-01-01 relative to ordinal 0, see
+# astral._julianday and astral.excel_datediff.
+_EXCEL_BASE = astral.Date(1900, 1, 1).toordinal() - 2
+
+_RADIANS = np.pi / 180.0
+_DEGREES = 180.0 / np.pi
+
+def _radians(x):
+    return x * _RADIANS
+
+def _degrees(x):
+    return x * _DEGREES
+
+def _jcentury(ordinals):
+    jd = (ordinals - _EXCEL_BASE) + 2415018.5
+    return (jd - 2451545.0) / 36525.0
+
+def _obliquity_correction(jc):
+    seconds = 21.448 - jc * (
+        46.815 + jc * (0.00059 - jc * (0.001813))
+    )
+    e0 = 23.0 + (26.0 + (seconds / 60.0)) / 60.0
+
+    omega = 125.04 - 1934.136 * jc
+    return e0 + 0.00256 * np.cos(_radians(omega))
+
+def _eq_of_time(jc):
+    l0 = (280.46646 + jc * (36000.76983 + 0.0003032 * jc)) % 360.0
+    e = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+    m = 357.52911 + jc * (35999.05029 - 0.0001537 * jc)
+
+    y = np.tan(_radians(_obliquity_correction(jc)) / 2.0)
+    y = y * y
+
+    sin2l0 = np.sin(2.0 * _radians(l0))
+    sinm = np.sin(_radians(m))
+    cos2l0 = np.cos(2.0 * _radians(l0))
+    sin4l0 = np.sin(4.0 * _radians(l0))
+    sin2m = np.sin(2.0 * _radians(m))
+
+    Etime = (
+        y * sin2l0
+        - 2.0 * e * sinm
+        + 4.0 * e * y * sinm * cos2l0
+        - 0.5 * y * y * sin4l0
+        - 1.25 * e * e * sin2m
+    )
+
+    return _degrees(Etime) * 4.0
+
+def _sun_declination(jc):
+    l0 = (280.46646 + jc * (36000.76983 + 0.0003032 * jc)) % 360.0
+    m = 357.52911 + jc * (35999.05029 - 0.0001537 * jc)
+
+    mrad = _radians(m)
+    sinm = np.sin(mrad)
+    sin2m = np.sin(mrad + mrad)
+    sin3m = np.sin(mrad + mrad + mrad)
+
+    c = (
+        sinm * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+        + sin2m * (0.019993 - 0.000101 * jc)
+        + sin3m * 0.000289
+    )
+
+    omega = 125.04 - 1934.136 * jc
+    lambd = (l0 + c) - 0.00569 - 0.00478 * np.sin(_radians(omega))
+
+    sint = np.sin(_radians(_obliquity_correction(jc))) * np.sin(_radians(lambd))
+    return _degrees(np.arcsin(sint))
+
+def _calc_time(depression, direction, ordinals, latitudes, longitudes):
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    latitudes = np.clip(np.asarray(latitudes, dtype=np.float64), -89.8, 89.8)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+
+    # The per-day terms don't depend on location, so they are
+    # evaluated once per ordinal and broadcast against the locations.
+    jc = _jcentury(ordinals)
+    eqtime = _eq_of_time(jc)
+    solarDec = _sun_declination(jc)
+
+    latitude_rad = _radians(latitudes)
+    declination_rad = _radians(solarDec)
+
+    n = np.cos(_radians(depression))
+    d = np.cos(latitude_rad) * np.cos(declination_rad)
+    t = np.tan(latitude_rad) * np.tan(declination_rad)
+    h = (n / d) - t
+
+    # math.acos raises for |h| > 1, here those days are masked instead.
+    never = np.abs(h) > 1.0
+    hourangle = np.arccos(np.where(never, 0.0, h))
+
+    if direction == astral.SUN_SETTING:
+        hourangle = -hourangle
+
+    delta = -longitudes - _degrees(hourangle)
+    timeDiff = 4.0 * delta # minutes
+    timeUTC = 720.0 + timeDiff - eqtime # minutes
+
+    # int() in the scalar version truncates towards zero
+    seconds = np.trunc(timeUTC * 60).astype(np.int64)
+    return ordinals * SECS_PER_DAY + seconds, never
+
+def sunrise_utc(ordinals, latitudes, longitudes):
+    """Calculate sunrise times in the UTC timezone.
+    :param ordinals:   Day ordinals (see astral.Date.toordinal) to calculate for.
+    :type ordinals:    array of int
+    :param latitudes:  Latitudes - Northern latitudes should be positive
+    :type latitudes:   array of float
+    :param longitudes: Longitudes - Eastern longitudes should be positive
+    :type longitudes:  array of float
+    :return: (seconds, never) arrays, broadcast from the inputs. seconds
+             is in the astral.DateSeconds.toordinal() timebase, never is
+             True where the sun doesn't reach the horizon on that day at
+             that location (and the matching seconds are meaningless).
+    """
+    return _calc_time(90 + 0.833, astral.SUN_RISING, ordinals, latitudes, longitudes)
+
+def sunset_utc(ordinals, latitudes, longitudes):
+    """Calculate sunset times in the UTC timezone, see sunrise_utc."""
+    return _calc_time(90 + 0.833, astral.SUN_SETTING, ordinals, latitudes, longitudes)
+
+def dawn_utc(ordinals, latitudes, longitudes, depression='civil'):
+    """Calculate dawn times in the UTC timezone, see sunrise_utc.
+    :param depression: Override the depression used
+    :type depression:  float
+    """
+    depression = astral._depression(depression) + 90
+    return _calc_time(depression, astral.SUN_RISING, ordinals, latitudes, longitudes)
+
+def dusk_utc(ordinals, latitudes, longitudes, depression='civil'):
+    """Calculate dusk times in the UTC timezone, see sunrise_utc.
+    :param depression: Override the depression used
+    :type depression:  float
+    """
+    depression = astral._depression(depression) + 90
+    return _calc_time(depression, astral.SUN_SETTING, ordinals, latitudes, longitudes)
+
+def grid(start, days, latitudes, longitudes):
+    """Return (ordinals, latitudes, longitudes) shaped (days, 1), (1, sites)
+    and (1, sites), ready to be broadcast into a days x sites result by
+    the functions above.
+    """
+    ordinals = start.toordinal() + np.arange(days, dtype=np.int64)
+    return (ordinals[:, np.newaxis],
+            np.asarray(latitudes, dtype=np.float64)[np.newaxis, :],
+            np.asarray(longitudes, dtype=np.float64)[np.newaxis, :])
+
+def _scalar(depression, direction, ordinals, latitudes, longitudes):
+    seconds = np.zeros((len(ordinals), len(latitudes)), dtype=np.int64)
+    never = np.zeros(seconds.shape, dtype=bool)
+    for i, ordinal in enumerate(ordinals):
+        date = astral.Date.fromordinal(int(ordinal))
+        for j, (latitude, longitude) in enumerate(zip(latitudes, longitudes)):
+            try:
+                seconds[i, j] = astral._calc_time(depression, direction, date,
+                                                  latitude, longitude).toordinal()
+            except ValueError: # never rises/sets
+                never[i, j] = True
+    return seconds, never
+
+if __name__ == "__main__":
+    # Compare against the scalar functions (on a subset of the grid,
+    # the scalar version is slow) and time a 10 year x 1000 site run.
+    import time
+
+    rng = np.random.default_rng(1)
+    sites = 1000
+    latitudes = rng.uniform(-70, 70, sites)
+    longitudes = rng.uniform(-180, 180, sites)
+    start = astral.Date(2020, 1, 1)
+    days = 3653
+
+    ordinals, lats, lons = grid(start, days, latitudes, longitudes)
+
+    for name, depression, direction in (("sunrise", 90 + 0.833, astral.SUN_RISING),
+                                        ("sunset", 90 + 0.833, astral.SUN_SETTING),
+                                        ("dawn", 96, astral.SUN_RISING),
+                                        ("dusk", 96, astral.SUN_SETTING)):
+        t0 = time.perf_counter()
+        seconds, never = _calc_time(depression, direction, ordinals, lats, lons)
+        batch_time = time.perf_counter() - t0
+
+        sample_days = ordinals[::97, 0]
+        sample_sites = slice(None, None, 50)
+        t0 = time.perf_counter()
+        expected, expected_never = _scalar(depression, direction, sample_days,
+                                           latitudes[sample_sites], longitudes[sample_sites])
+        scalar_time = time.perf_counter() - t0
+        scalar_time *= seconds.size / expected.size
+
+        got = seconds[::97, sample_sites]
+        got_never = never[::97, sample_sites]
+        mismatches = np.count_nonzero((got != expected) & ~expected_never)
+        mismatches += np.count_nonzero(got_never != expected_never)
+
+        print(f"{name}: {seconds.size} events in {batch_time:.3f}s, "
+              f"~{scalar_time / batch_time:.0f}x scalar, "
+              f"{mismatches} mismatches in {expected.size} samples")
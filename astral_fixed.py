@@ -0,0 +1,234 @@
+# Scaled-integer version of the astral.py calculations, for boards
+# where floats are single precision (or 30 bit) and the libm trig is
+# slow. Results are DateSeconds, like astral's, and stay within
+# MAX_ERROR seconds of the float calculation for latitudes between -66
+# and 66 and dates between 1800 and 2199, as long as the sun isn't
+# grazing the horizon (|cos(hour angle)| <= GRAZING, which leaves out
+# the few days either side of midnight sun/polar night where the event
+# time is extremely sensitive to every input). On those days the error
+# can grow to a couple of minutes. bench_fixed.py measures all this;
+# typical errors are a couple of seconds.
+#
+# Representation:
+#
+#   angles       binary angle units, 1 << 22 to the turn (the longer
+#                period terms are accumulated with 4 extra bits)
+#   sin/cos      Q14 (1 << 14 == 1.0), from a quarter wave table with
+#                linear interpolation
+#   e, y, E      Q20
+#
+# Every intermediate fits in a CircuitPython small int (31 bits
+# signed). latitude/longitude are floats on the way in, as the GPS
+# delivers them; they are converted once per call.
+
+from array import array
+from math import sin, pi
+
+import astral
+
+MAX_ERROR = 30 # seconds, see above
+GRAZING = 0.98
+
+ONE = 1 << 14
+TURN = 1 << 22
+QUARTER = TURN >> 2
+_MASK = TURN - 1
+
+_TABLE_BITS = 8 # table entries per quarter turn, log2
+_FRAC_BITS = 20 - _TABLE_BITS
+_FRAC_MASK = (1 << _FRAC_BITS) - 1
+_ROUND = 1 << (_FRAC_BITS - 1)
+
+_SIN = array('h', (int(sin(i * pi / (2 << _TABLE_BITS)) * ONE + 0.5)
+                   for i in range((1 << _TABLE_BITS) + 1)))
+
+_UNITS_PER_DEGREE = TURN / 360.0
+
+def _sin(a):
+    "angle units -> Q14 sine"
+    a &= _MASK
+    quadrant = a >> 20
+    r = a & (QUARTER - 1)
+    if quadrant & 1:
+        r = QUARTER - r
+
+    i = r >> _FRAC_BITS
+    f = r & _FRAC_MASK
+    v = _SIN[i]
+    if f:
+        v += ((_SIN[i + 1] - v) * f + _ROUND) >> _FRAC_BITS
+
+    return -v if quadrant & 2 else v
+
+def _cos(a):
+    "angle units -> Q14 cosine"
+    return _sin(a + QUARTER)
+
+def _isqrt(n):
+    "floor(sqrt(n)) for n >= 0"
+    if n <= 0:
+        return 0
+    x = n
+    y = (x + 1) >> 1
+    while y < x:
+        x = y
+        y = (x + n // x) >> 1
+    return x
+
+# Q14 radians -> angle units, scaled by 1 << 10
+_RAD_TO_UNITS = 41722
+
+# Above this the table is too flat to invert accurately, use a series
+# around 1 instead.
+_ASIN_TABLE_LIMIT = 15892 # ~0.97
+
+def _asin(v):
+    "Q14 value in -ONE..ONE -> angle units in -QUARTER..QUARTER"
+    negative = v < 0
+    if negative:
+        v = -v
+
+    if v > _ASIN_TABLE_LIMIT:
+        # acos(1 - x) ~= sqrt(2x) * (1 + x / 12)
+        x = ONE - v
+        s = _isqrt((2 * x) << 14)
+        s += (s * x) // (12 * ONE)
+        a = QUARTER - ((s * _RAD_TO_UNITS) >> 10)
+    else:
+        lo = 0
+        hi = 1 << _TABLE_BITS
+        while hi - lo > 1:
+            mid = (lo + hi) >> 1
+            if _SIN[mid] <= v:
+                lo = mid
+            else:
+                hi = mid
+        a = (lo << _FRAC_BITS) + ((v - _SIN[lo]) << _FRAC_BITS) // (_SIN[lo + 1] - _SIN[lo])
+
+    return -a if negative else a
+
+# The fast moving angles (in 1 << 26 units to the turn) are linear in
+# the number of half days since J2000.0. They are evaluated as the
+# angle at -_H0 half days plus a per-nibble rate for each hex digit of
+# (half days + _H0), which keeps every product small. Generated by
+# bench_fixed.py --constants.
+_H0 = 1 << 19
+
+_L0 = (3527853, (91869, 1469904, 23518462, 40751074, 48037401))
+_M = (20193963, (91865, 1469834, 23517339, 40733100, 47749827))
+_OMEGA = (60873306, (67103928, 67029894, 65845338, 46892450, 12081696))
+
+_MASK26 = (1 << 26) - 1
+
+def _angle(terms, n):
+    "Angle (in 1 << 22 units) of terms at n = half days + _H0"
+    acc, rates = terms
+    for rate in rates:
+        acc = (acc + (n & 15) * rate) & _MASK26
+        n >>= 4
+    return acc >> 4
+
+_ORDINAL_J2000 = 730120 # 2000-01-01
+
+def _solar_terms(date):
+    "date -> (equation of time in seconds, declination in angle units)"
+    hd = 2 * (date.toordinal() - _ORDINAL_J2000) - 1 # half days from J2000.0
+    n = hd + _H0
+    if n < 0 or n >> 20:
+        raise ValueError("date out of range")
+
+    # Julian centuries, Q12
+    T = (hd // 73050) * 4096 + ((hd % 73050) << 12) // 73050
+
+    l0 = _angle(_L0, n)
+    m = _angle(_M, n)
+    omega = _angle(_OMEGA, n)
+
+    sinm = _sin(m)
+    sin_omega = _sin(omega)
+
+    # Obliquity, eccentricity
+    epsilon = 273088 - ((T * 152) >> 12) + ((30 * _cos(omega)) >> 14)
+    e = 17520 - ((T * 44) >> 12)
+
+    # y = tan(epsilon / 2) ** 2, Q20
+    tan_half = (_sin(epsilon >> 1) << 14) // _cos(epsilon >> 1)
+    y = (tan_half * tan_half) >> 8
+
+    sin2m = _sin(2 * m)
+    E = (
+        ((y * _sin(2 * l0)) >> 14)
+        - ((2 * e * sinm) >> 14)
+        + (((((e * y) >> 18) * sinm) >> 14) * _cos(2 * l0) >> 14)
+        - (((((y >> 4) * (y >> 4)) >> 12) * _sin(4 * l0)) >> 15)
+        - (((((e * e) >> 20) * 5 >> 2) * sin2m) >> 14)
+    )
+    # radians -> minutes of time * 60, 13751 / 4 == 3438
+    eqtime = (E * 3438) >> 18
+
+    # Sun's apparent longitude and declination
+    c = (
+        ((sinm * (22307 - ((T * 56) >> 12))) >> 14)
+        + ((sin2m * 233) >> 14)
+        + ((_sin(3 * m) * 3) >> 14)
+    )
+    lambd = l0 + c - 66 - ((56 * sin_omega) >> 14)
+    declination = _asin((_sin(epsilon) * _sin(lambd) + (1 << 13)) >> 14)
+
+    return eqtime, declination
+
+_MAX_LATITUDE = int(89.8 * _UNITS_PER_DEGREE)
+
+def _calc_time(depression, direction, date, latitude, longitude):
+    "Same contract as astral._calc_time (for depression != 0)"
+    eqtime, declination = _solar_terms(date)
+
+    latitude = int(latitude * _UNITS_PER_DEGREE)
+    if latitude > _MAX_LATITUDE:
+        latitude = _MAX_LATITUDE
+    if latitude < -_MAX_LATITUDE:
+        latitude = -_MAX_LATITUDE
+
+    # cos(HA) = (cos(z) - sin(lat) sin(dec)) / (cos(lat) cos(dec)), Q28
+    # over Q28 with the denominator cut down to Q15 for the division.
+    n = _cos(int(depression * _UNITS_PER_DEGREE)) * ONE - _sin(latitude) * _sin(declination)
+    d = _cos(latitude) * _cos(declination)
+    h = ((n << 1) + (d >> 14)) // ((d + (1 << 12)) >> 13)
+
+    if h > ONE or h < -ONE:
+        raise ValueError("math domain error")
+
+    hourangle = QUARTER - _asin(h)
+    if direction == astral.SUN_SETTING:
+        hourangle = -hourangle
+
+    # A turn is 86400 seconds of hour angle, 86400 / (1 << 22) == 675 / (1 << 15)
+    seconds = 43200 - int(longitude * 240) - (((hourangle >> 2) * 675) >> 13) - eqtime
+
+    return astral.DateSeconds(date, seconds)
+
+def sunrise_utc(date, latitude, longitude):
+    """Calculate sunrise time in the UTC timezone, see astral.sunrise_utc.
+    Raises ValueError if the sun doesn't reach the horizon that day.
+    """
+    return _calc_time(90 + 0.833, astral.SUN_RISING, date, latitude, longitude)
+
+def sunset_utc(date, latitude, longitude):
+    """Calculate sunset time in the UTC timezone, see astral.sunset_utc.
+    Raises ValueError if the sun doesn't reach the horizon that day.
+    """
+    return _calc_time(90 + 0.833, astral.SUN_SETTING, date, latitude, longitude)
+
+def dawn_utc(date, latitude, longitude, depression='civil'):
+    """Calculate dawn time in the UTC timezone, see astral.dawn_utc.
+    Raises ValueError if the sun doesn't reach depression that day.
+    """
+    depression = astral._depression(depression) + 90
+    return _calc_time(depression, astral.SUN_RISING, date, latitude, longitude)
+
+def dusk_utc(date, latitude, longitude, depression='civil'):
+    """Calculate dusk time in the UTC timezone, see astral.dusk_utc.
+    Raises ValueError if the sun doesn't reach depression that day.
+    """
+    depression = astral._depression(depression) + 90
+    return _calc_time(depression, astral.SUN_SETTING, date, latitude, longitude)
@@ -0,0 +1,324 @@
+# Host side benchmark and accuracy regression suite for astral.py.
+#
+#   python bench_astral.py [--quick] [--output results.json]
+#   python bench_astral.py --regenerate-golden
+#
+# Runs three things and exits non-zero if either check fails:
+#
+#  * a differential check of astral.Date against datetime.date over
+#    every ordinal in 1..9999
+#  * the events in astral_golden.json, which holds reference times from
+#    the upstream astral package (https://github.com/sffjunkie/astral)
+#    and the times this module gave when the file was generated. Any
+#    change to the latter is reported as a regression; the distance to
+#    the former is reported (and must not grow) so deliberate changes
+#    to the calculation can be judged.
+#  * benchmarks (ops/s, and tracemalloc peak/retained bytes per op) of
+#    the event functions across a latitude and date sweep, the event
+#    searches, the ordinal conversions and DateSeconds construction.
+#
+# Results are written as JSON (progress goes to stderr) so they can be
+# tracked over time.
+#
+# --regenerate-golden needs the upstream astral package installed
+# (pip install astral); it rewrites astral_golden.json.
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import astral
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GOLDEN = os.path.join(HERE, "astral_golden.json")
+
+# Slack allowed on the distance to upstream before it is a regression
+UPSTREAM_SLACK = 5 # seconds
+
+EVENTS = {
+    astral.SUNRISE: astral.sunrise_utc,
+    astral.SUNSET: astral.sunset_utc,
+    astral.DAWN: astral.dawn_utc,
+    astral.DUSK: astral.dusk_utc,
+}
+
+LATITUDES = [-70 + 10 * i for i in range(15)]
+
+def golden_dates():
+    dates = [datetime.date(2024, month, day) for month in range(1, 13) for day in (1, 15)]
+    for year in (1900, 1950, 2000, 2050, 2100):
+        dates += [datetime.date(year, 6, 21), datetime.date(year, 12, 21)]
+    return dates
+
+def _event(function, date, latitude, longitude):
+    # astral event time (in toordinal() seconds) or None if it never happens
+    try:
+        return function(date, latitude, longitude).toordinal()
+    except astral.AstralError:
+        return None
+
+#
+# Date differential check
+#
+
+def check_dates():
+    failures = []
+    for n in range(1, datetime.date.max.toordinal() + 1):
+        expected = datetime.date.fromordinal(n)
+        date = astral.Date.fromordinal(n)
+        if (date.year, date.month, date.day) != (expected.year, expected.month, expected.day):
+            failures.append("fromordinal(%d) -> %s, expected %s" % (n, date, expected))
+        elif str(date) != "%4d-%02d-%02d" % (expected.year, expected.month, expected.day):
+            failures.append("str(fromordinal(%d)) -> %s" % (n, date))
+        elif n % 7 == 0:
+            # The constructor is slower, sample it
+            if astral.Date(expected.year, expected.month, expected.day).toordinal() != n:
+                failures.append("Date(%s).toordinal() != %d" % (expected, n))
+        if len(failures) >= 10:
+            break
+    return failures
+
+#
+# Golden values
+#
+
+def _import_upstream():
+    # The local astral.py shadows the upstream package, hide it while
+    # importing.
+    local = sys.modules.pop("astral")
+    saved_path = sys.path
+    sys.path = [p for p in sys.path if os.path.abspath(p or ".") != HERE]
+    try:
+        import astral as upstream
+        import astral.sun
+        return upstream, astral.sun
+    finally:
+        sys.path = saved_path
+        sys.modules["astral"] = local
+
+def regenerate_golden():
+    upstream, sun = _import_upstream()
+    functions = {
+        astral.SUNRISE: sun.sunrise,
+        astral.SUNSET: sun.sunset,
+        astral.DAWN: sun.dawn,
+        astral.DUSK: sun.dusk,
+    }
+
+    cases = []
+    for date in golden_dates():
+        for i, latitude in enumerate(LATITUDES):
+            longitude = -170 + 47 * i % 340
+            observer = upstream.Observer(latitude, longitude)
+            for event, function in EVENTS.items():
+                ours = _event(function, astral.Date(date.year, date.month, date.day),
+                              latitude, longitude)
+
+                # Upstream reports the event that falls on the UTC
+                # date, which isn't always the one astral.py calculates
+                # for it. Take whichever of the adjacent days' events is
+                # closest.
+                reference = None
+                for offset in (-1, 0, 1):
+                    try:
+                        t = functions[event](observer, date + datetime.timedelta(offset))
+                    except ValueError:
+                        continue
+                    seconds = (t.date().toordinal() * astral.SECS_PER_DAY
+                               + t.hour * 3600 + t.minute * 60 + t.second)
+                    if reference is None or ours is None or abs(seconds - ours) < abs(reference - ours):
+                        reference = seconds
+                    if ours is None:
+                        break
+
+                cases.append([date.toordinal(), latitude, longitude, event, reference, ours])
+
+    # One case per line, to keep diffs of the file readable
+    with open(GOLDEN, "w") as f:
+        f.write('{"generator": %s,\n "cases": [\n' %
+                json.dumps("upstream astral %s" % getattr(upstream, "__version__", "?")))
+        f.write(",\n".join("  " + json.dumps(case) for case in cases))
+        f.write("\n]}\n")
+    print("wrote %d cases to %s" % (len(cases), GOLDEN))
+
+def check_golden():
+    with open(GOLDEN) as f:
+        golden = json.load(f)
+
+    failures = []
+    worst = 0
+    for ordinal, latitude, longitude, event, reference, baseline in golden["cases"]:
+        date = astral.Date.fromordinal(ordinal)
+        ours = _event(EVENTS[event], date, latitude, longitude)
+        where = "%s %s at %s,%s" % (event, date, latitude, longitude)
+
+        if ours != baseline:
+            failures.append("%s: %s, was %s" % (where, ours, baseline))
+        if ours is None or reference is None:
+            if (ours is None) != (reference is None) and baseline is not None:
+                failures.append("%s: %s, upstream %s" % (where, ours, reference))
+            continue
+
+        error = abs(ours - reference)
+        if abs(latitude) <= 60:
+            # Further out the sun grazes the horizon for days at a time
+            # and the two drift apart by minutes.
+            worst = max(worst, error)
+        if error > abs(baseline - reference) + UPSTREAM_SLACK:
+            failures.append("%s: %d s from upstream, was %d s"
+                            % (where, error, abs(baseline - reference)))
+
+    return failures, {"cases": len(golden["cases"]), "max_upstream_error_60": worst,
+                      "generator": golden["generator"]}
+
+#
+# Benchmarks
+#
+
+def measure(name, function, ops, results, **info):
+    # Run function() (which does ops operations) once untraced for the
+    # timing and once under tracemalloc for the memory.
+    t0 = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - t0
+
+    tracemalloc.start()
+    try:
+        function()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = dict(info, name=name, ops=ops, ops_per_sec=ops / elapsed,
+                  peak_bytes_per_op=peak / ops, retained_bytes_per_op=retained / ops)
+    results.append(result)
+    print("%-36s %10.0f ops/s %8.1f peak B/op %8.1f retained B/op"
+          % (name + "".join(" %s=%s" % item for item in sorted(info.items())),
+             result["ops_per_sec"], result["peak_bytes_per_op"], result["retained_bytes_per_op"]),
+          file=sys.stderr)
+
+def benchmarks(quick):
+    results = []
+    days = 30 if quick else 365
+    start = astral.Date(2024, 1, 1)
+    dates = [start + i for i in range(days)]
+    latitudes = (-60, -30, 0, 30, 60)
+
+    for event, function in EVENTS.items():
+        for latitude in latitudes:
+            def run(function=function, latitude=latitude):
+                for date in dates:
+                    try:
+                        function(date, latitude, -75.0)
+                    except astral.AstralError:
+                        pass
+            measure(event + "_utc", run, len(dates), results, latitude=latitude)
+
+    for year in (1900, 2000, 2100):
+        year_dates = [astral.Date(year, 1, 1) + i for i in range(days)]
+        def run(year_dates=year_dates):
+            for date in year_dates:
+                astral.sunrise_utc(date, 40.0, -75.0)
+        measure("sunrise_utc", run, len(year_dates), results, year=year)
+
+    # A whole day's events (noon, sunrise, sunset, and dawn and dusk at
+    # three depressions) one at a time and via solar_day
+    depressions = ("civil", "nautical", "astronomical")
+    for latitude in latitudes:
+        def run(latitude=latitude):
+            for date in dates:
+                astral.solar_noon_utc(date, latitude, -75.0)
+                for function in (astral.sunrise_utc, astral.sunset_utc):
+                    try:
+                        function(date, latitude, -75.0)
+                    except astral.AstralError:
+                        pass
+                for depression in depressions:
+                    for function in (astral.dawn_utc, astral.dusk_utc):
+                        try:
+                            function(date, latitude, -75.0, depression)
+                        except astral.AstralError:
+                            pass
+        measure("day_separately", run, len(dates), results, latitude=latitude)
+
+        def run(latitude=latitude):
+            for date in dates:
+                astral.solar_day(date, latitude, -75.0, depressions)
+        measure("solar_day", run, len(dates), results, latitude=latitude)
+
+    times = [astral.DateSeconds(date, 3600 * (i % 24)) for i, date in enumerate(dates)]
+    for search in (astral.time_of_first_after, astral.time_of_last_before):
+        def run(search=search):
+            for t in times:
+                search(astral.sunrise_utc, t, 40.0, -75.0)
+        measure(search.__name__, run, len(times), results)
+
+    def run():
+        for t in times:
+            astral.next_transition(t, 40.0, -75.0)
+    measure("next_transition", run, len(times), results)
+
+    ordinals = [730000 + 37 * i for i in range(10 * days)]
+    def run():
+        for n in ordinals:
+            astral._ord2ymd(n)
+    measure("_ord2ymd", run, len(ordinals), results)
+
+    ymds = [astral._ord2ymd(n) for n in ordinals]
+    def run():
+        for y, m, d in ymds:
+            astral._ymd2ord(y, m, d)
+    measure("_ymd2ord", run, len(ymds), results)
+
+    def run():
+        for i, date in enumerate(dates):
+            astral.DateSeconds(date, 1000 * i)
+    measure("DateSeconds", run, len(dates), results)
+
+    def run():
+        for i, date in enumerate(dates):
+            astral.DateSeconds(date, -1000000 * i)
+    measure("DateSeconds(normalize)", run, len(dates), results)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="astral.py benchmarks and accuracy checks")
+    parser.add_argument("--quick", action="store_true", help="shorter benchmark runs")
+    parser.add_argument("--output", help="write the JSON results here (default stdout)")
+    parser.add_argument("--regenerate-golden", action="store_true")
+    args = parser.parse_args()
+
+    if args.regenerate_golden:
+        regenerate_golden()
+        return 0
+
+    date_failures = check_dates()
+    golden_failures, golden_info = check_golden()
+    for failure in date_failures + golden_failures:
+        print("FAIL:", failure, file=sys.stderr)
+
+    results = {
+        "timestamp": time.time(),
+        "python": platform.python_implementation() + " " + platform.python_version(),
+        "date_check": {"failures": date_failures},
+        "golden_check": dict(golden_info, failures=golden_failures),
+        "benchmarks": benchmarks(args.quick),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    else:
+        json.dump(results, sys.stdout, indent=1)
+        print()
+
+    return 1 if date_failures or golden_failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
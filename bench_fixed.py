@@ -0,0 +1,150 @@
+# Host side harness for astral_fixed.py: measures its error against the
+# float calculation in astral.py across latitudes -66..66 and the
+# years 1800..2199, and benchmarks both.
+#
+#   python bench_fixed.py [--lat-step DEGREES] [--day-step DAYS]
+#   python bench_fixed.py --constants
+#
+# Exits non-zero if the error bound documented in astral_fixed.py
+# doesn't hold. --constants prints the angle tables that are pasted
+# into astral_fixed.py.
+
+import argparse
+import math
+import time
+from fractions import Fraction
+
+import astral
+import astral_fixed
+
+EVENTS = (
+    ("sunrise", 90 + 0.833, astral.SUN_RISING),
+    ("sunset", 90 + 0.833, astral.SUN_SETTING),
+    ("dawn", 96, astral.SUN_RISING),
+    ("dusk", 96, astral.SUN_SETTING),
+)
+
+def constants():
+    # (name, degrees at J2000.0, degrees per Julian century)
+    terms = (("_L0", "280.46646", "36000.76983"),
+             ("_M", "357.52911", "35999.05029"),
+             ("_OMEGA", "125.04", "-1934.136"))
+
+    units = Fraction(1 << 26) / 360
+    for name, a0, rate in terms:
+        per_half_day = Fraction(rate) / 73050
+        base = round((Fraction(a0) - astral_fixed._H0 * per_half_day) * units) % (1 << 26)
+        rates = tuple(round(per_half_day * units * 16 ** k) % (1 << 26) for k in range(5))
+        print("%s = (%d, %s)" % (name, base, rates))
+
+def cos_hour_angle(date, depression, latitude):
+    _, declination = astral._solar_terms(date)
+    latitude = math.radians(max(-89.8, min(89.8, latitude)))
+    declination = math.radians(declination)
+    return (math.cos(math.radians(depression)) / (math.cos(latitude) * math.cos(declination))
+            - math.tan(latitude) * math.tan(declination))
+
+def accuracy(lat_step, day_step):
+    start = astral.Date(1800, 1, 1).toordinal()
+    end = astral.Date(2200, 1, 1).toordinal()
+    latitudes = [-66 + i * lat_step for i in range(int(132 / lat_step) + 1)]
+
+    errors = []     # (error, |cos(hour angle)|)
+    disagree = 0    # one says the event happens, the other doesn't
+    for ordinal in range(start, end, day_step):
+        date = astral.Date.fromordinal(ordinal)
+        for latitude in latitudes:
+            longitude = (ordinal * 7.3) % 360 - 180 # vary it too
+            for _, depression, direction in EVENTS:
+                try:
+                    expected = astral._calc_time(depression, direction, date, latitude, longitude)
+                except ValueError:
+                    expected = None
+                try:
+                    got = astral_fixed._calc_time(depression, direction, date, latitude, longitude)
+                except ValueError:
+                    got = None
+
+                if expected is None or got is None:
+                    if expected is not got:
+                        disagree += 1
+                    continue
+
+                errors.append((abs(got - expected),
+                               abs(cos_hour_angle(date, depression, latitude))))
+
+    return errors, disagree
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def benchmark(repeat=2000):
+    date = astral.Date(2024, 6, 1)
+    cases = [(date + i, -60 + (i * 7) % 120, (i * 13) % 360 - 180) for i in range(repeat)]
+
+    results = {}
+    for name, module in (("float", astral), ("fixed", astral_fixed)):
+        t0 = time.perf_counter()
+        for date, latitude, longitude in cases:
+            try:
+                module._calc_time(90 + 0.833, astral.SUN_RISING, date, latitude, longitude)
+            except ValueError:
+                pass
+        results[name] = repeat / (time.perf_counter() - t0)
+
+    # Count the table/integer primitives per call in the fixed version
+    counts = {}
+    originals = {}
+    for name in ("_sin", "_asin", "_isqrt"):
+        original = originals[name] = getattr(astral_fixed, name)
+        counts[name] = 0
+        def counted(*args, _name=name, _original=original):
+            counts[_name] += 1
+            return _original(*args)
+        setattr(astral_fixed, name, counted)
+    try:
+        for date, latitude, longitude in cases:
+            try:
+                astral_fixed._calc_time(90 + 0.833, astral.SUN_RISING, date, latitude, longitude)
+            except ValueError:
+                pass
+    finally:
+        for name, original in originals.items():
+            setattr(astral_fixed, name, original)
+
+    return results, {name: count / repeat for name, count in counts.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lat-step", type=float, default=6)
+    parser.add_argument("--day-step", type=int, default=29)
+    parser.add_argument("--constants", action="store_true")
+    args = parser.parse_args()
+
+    if args.constants:
+        constants()
+        return 0
+
+    errors, disagree = accuracy(args.lat_step, args.day_step)
+    inside = sorted(error for error, h in errors if h <= astral_fixed.GRAZING)
+    grazing = sorted(error for error, h in errors if h > astral_fixed.GRAZING)
+
+    print("events compared: %d (%d grazing), never/occurs disagreements: %d"
+          % (len(errors), len(grazing), disagree))
+    print("error (s), |cos(HA)| <= %.2f: median %d p99 %d max %d"
+          % (astral_fixed.GRAZING, percentile(inside, 0.5), percentile(inside, 0.99), inside[-1]))
+    if grazing:
+        print("error (s), grazing: median %d p99 %d max %d"
+              % (percentile(grazing, 0.5), percentile(grazing, 0.99), grazing[-1]))
+
+    rates, ops = benchmark()
+    print("calls/s: float %.0f fixed %.0f" % (rates["float"], rates["fixed"]))
+    print("fixed primitives per call: " + ", ".join("%s %.1f" % item for item in sorted(ops.items())))
+
+    if inside[-1] > astral_fixed.MAX_ERROR:
+        print("FAIL: error above MAX_ERROR (%d s)" % astral_fixed.MAX_ERROR)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,168 @@
+# Host side benchmark of the per-tick cost of flickering the lamp, each
+# writing three duty cycles:
+#
+#   flicker  code.py's default path, BigFlicker: the flicker library's
+#            Flicker run state by state. The library is in the
+#            statemachines submodule, so this is only run when that is
+#            checked out.
+#   live     waveform.py's flame model computed every tick, the same
+#            flame as the table without it (not the flicker library)
+#   table    playing a precomputed waveform.Waveform, as code.py's
+#            TableFlicker does
+#
+#   python bench_waveform.py [--ticks N]
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import waveform
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MAX = 255 * 255
+
+class Policy:
+    # flicker.FlickerPolicy as code.py configures it
+    index_bottom = 64
+    index_min = MAX // 4
+    index_max = MAX
+
+class PWM:
+    duty_cycle = 0
+
+RED, GREEN, BLUE = PWM(), PWM(), PWM()
+
+def set_led(r, g, b):
+    RED.duty_cycle = r
+    GREEN.duty_cycle = g
+    BLUE.duty_cycle = b
+
+def library_flicker():
+    """A tick function running code.py's BigFlicker on the flicker
+    library from the statemachines submodule, or None if it isn't
+    checked out
+    """
+    path = os.path.join(HERE, "statemachines")
+    sys.path.insert(0, path)
+    try:
+        import statemachines
+        import flicker
+    except ImportError:
+        return None
+    finally:
+        sys.path.remove(path)
+    if not hasattr(flicker, "Flicker") or not hasattr(statemachines, "Pulser"):
+        return None
+
+    class BigFlicker(flicker.Flicker):
+        # As in code.py, with the lamp always on
+        def set_color(self, red, green, blue):
+            set_led(red, green, blue)
+
+        def suppress(self):
+            return None
+
+    machine = BigFlicker(statemachines.Pulser(0.01),
+                         flicker.FlickerPolicy(index_bottom=Policy.index_bottom,
+                                               index_min=Policy.index_min,
+                                               index_max=Policy.index_max))
+    state = [machine.start]
+
+    def tick():
+        # What the executive does each time the Pulser fires
+        next_state, _ = state[0](time.monotonic_ns())
+        if next_state is not None:
+            state[0] = next_state
+    return tick
+
+class Live:
+    # The waveform's model, computed a tick at a time
+    def __init__(self, policy, color=(256, 96, 12)):
+        self.policy = policy
+        self.color = color
+        self.level = self.target = policy.index_min
+        self.hold = 0
+
+    def tick(self):
+        policy = self.policy
+        if self.hold == 0:
+            if random.randint(0, 31) == 0:
+                self.target = policy.index_bottom
+                self.hold = random.randint(2, 6)
+            else:
+                self.target = random.randint(policy.index_min, policy.index_max)
+                self.hold = random.randint(3, 10)
+        self.hold -= 1
+        self.level += (self.target - self.level) >> 2
+        red, green, blue = self.color
+        set_led(self.level * red >> 8, self.level * green >> 8, self.level * blue >> 8)
+
+class Table:
+    # code.py's TableFlicker.on, less the state machine plumbing
+    def __init__(self, wave):
+        self.wave = wave
+        self.i = 0
+
+    def tick(self):
+        i = self.i
+        wave = self.wave
+        if i == wave.next_boundary:
+            i = wave.refresh(i)
+        table = wave.table
+        set_led(table[i], table[i + 1], table[i + 2])
+        self.i = i + 3
+
+def measure(name, tick, ticks):
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        tick()
+    elapsed = time.perf_counter() - t0
+
+    worst = 0
+    for _ in range(ticks // 10):
+        t1 = time.perf_counter()
+        tick()
+        worst = max(worst, time.perf_counter() - t1)
+
+    tracemalloc.start()
+    for _ in range(ticks):
+        tick()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("%-7s %7.2f us/tick (worst %6.1f us) %8.0f ticks/s, peak %d B"
+          % (name, 1e6 * elapsed / ticks, 1e6 * worst, ticks / elapsed, peak))
+
+def main():
+    parser = argparse.ArgumentParser(description="flicker per-tick cost")
+    parser.add_argument("--ticks", type=int, default=200000)
+    parser.add_argument("--length", type=int, default=512)
+    parser.add_argument("--chunk", type=int, default=32)
+    parser.add_argument("--refresh-every", type=int, default=5)
+    args = parser.parse_args()
+
+    wave = waveform.Waveform(Policy, args.length, args.chunk, args.refresh_every)
+    print("table: %d ticks, %d bytes, %d ticks regenerated every %d chunks played"
+          % (args.length, len(wave.table) * wave.table.itemsize, args.chunk, args.refresh_every))
+    tick = library_flicker()
+    if tick is None:
+        print("flicker: statemachines submodule not checked out, not run")
+    else:
+        measure("flicker", tick, args.ticks)
+    measure("live", Live(Policy).tick, args.ticks)
+    measure("table", Table(wave).tick, args.ticks)
+
+    # The spike a tick sees when it regenerates a chunk
+    t0 = time.perf_counter()
+    for _ in range(100):
+        wave._generate(0)
+    print("chunk regeneration %.1f us, %.2f us/tick amortized"
+          % (1e4 * (time.perf_counter() - t0),
+             1e4 * (time.perf_counter() - t0) / (args.chunk * args.refresh_every)))
+
+if __name__ == "__main__":
+    main()
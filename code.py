@@ -1,5 +1,7 @@
+import array
 import board
 import digitalio
+import microcontroller
 import pwmio
 import time
 
@@ -7,7 +9,94 @@ import statemachines
 
 import gps
 import astral
+import schedule
+import solarcache
+import waveform
 import flicker
+import tracer
+import stateprof
+import persist
+import triggers
+
+MAX = 255 * 255
+
+# Set to time every state function dispatch (see stateprof.py), Debug
+# prints the results
+PROFILE = False
+profiler = stateprof.Profiler() if PROFILE else None
+
+# Compute the flame every tick with the flicker library (BigFlicker), or
+# set to True to play it from a precomputed waveform (TableFlicker).
+# That's cheaper per tick, but waveform.py's flame model is its own, not
+# the flicker library's, so the lamp looks different
+TABLE_FLICKER = False
+
+# Output stage between the flame and the PWM pins. Colours come in on
+# the 0..MAX scale; each channel goes through a 1024 entry table
+# (indexed by the top 10 bits) that applies gamma correction, the
+# channel's white balance and the overall brightness, and a duty cycle
+# is only written when it changes. The tables are that fine so the dim
+# end of the flicker (and the small blue channel), where gamma squeezes
+# the most, still moves smoothly. Changing the brightness rebuilds the
+# tables, so dimming costs nothing per tick.
+#
+class LedOutput:
+    SHIFT = 6
+    SIZE = 1 << (16 - SHIFT)
+
+    def __init__(self, red, green, blue, gamma=2.2, balance=(1.0, 1.0, 1.0), brightness=1.0):
+        self.red = red
+        self.green = green
+        self.blue = blue
+        self.gamma = gamma
+        self.balance = balance
+
+        self._red_lut = array.array('H', (0 for _ in range(self.SIZE)))
+        self._green_lut = array.array('H', (0 for _ in range(self.SIZE)))
+        self._blue_lut = array.array('H', (0 for _ in range(self.SIZE)))
+
+        self.calls = 0
+        self.writes = 0
+        self.set_brightness(brightness)
+
+    def set_brightness(self, brightness):
+        "Scale everything by brightness (0..1), clipping at full duty"
+        self.brightness = brightness
+        top = MAX >> self.SHIFT
+        for lut, balance in ((self._red_lut, self.balance[0]),
+                             (self._green_lut, self.balance[1]),
+                             (self._blue_lut, self.balance[2])):
+            scale = 65535 * balance * brightness
+            for i in range(self.SIZE):
+                lut[i] = min(int(scale * min(i / top, 1) ** self.gamma + 0.5), 65535)
+
+        # Make the next write() write all three
+        self._red = self._green = self._blue = -1
+
+    def write(self, r, g, b):
+        self.calls += 1
+
+        shift = self.SHIFT
+        value = self._red_lut[r >> shift]
+        if value != self._red:
+            self._red = value
+            self.red.duty_cycle = value
+            self.writes += 1
+
+        value = self._green_lut[g >> shift]
+        if value != self._green:
+            self._green = value
+            self.green.duty_cycle = value
+            self.writes += 1
+
+        value = self._blue_lut[b >> shift]
+        if value != self._blue:
+            self._blue = value
+            self.blue.duty_cycle = value
+            self.writes += 1
+
+    def __str__(self):
+        return f"{self.__class__.__name__}:{self.brightness}:{self.writes}/{3 * self.calls} writes"
 
 # Functions for low level control of flame LED
 #
@@ -15,10 +104,10 @@ RED_LED   = pwmio.PWMOut(board.D11, frequency=50000, duty_cycle=0)
 GREEN_LED = pwmio.PWMOut(board.D12, frequency=50000, duty_cycle=0)
 BLUE_LED  = pwmio.PWMOut(board.D13, frequency=50000, duty_cycle=0)
 
+OUTPUT = LedOutput(RED_LED, GREEN_LED, BLUE_LED)
+
 def set_led(r, g, b):
-    RED_LED.duty_cycle = r
-    GREEN_LED.duty_cycle = g
-    BLUE_LED.duty_cycle = b
+    OUTPUT.write(r, g, b)
 
 def blink(count, r, g, b):
     for _ in range(count):
@@ -27,8 +116,6 @@ def blink(count, r, g, b):
         set_led(0, 0, 0)
         time.sleep(0.5)
 
-MAX = 255 * 255
-
 # Subclass of Flicker object that controls high power LED hooked up
 # to propmaker board
 #
@@ -46,6 +133,49 @@ class BigFlicker(flicker.Flicker):
 
         return self.controller
 
+# Flicker that plays a precomputed waveform.Waveform instead of
+# computing each tick; same role (and Debug visible attributes) as
+# BigFlicker, see TABLE_FLICKER.
+#
+class TableFlicker:
+    def __init__(self, event, wave, controller):
+        self.event = event
+        self.wave = wave
+        self.controller = controller
+        self.transitions = 0
+        self.state = self.start
+        self._i = 0
+
+    def _to(self, state):
+        self.transitions += 1
+        self.state = state
+        return state, statemachines.IMMEDATE_TRANSFER
+
+    def start(self, now):
+        return self._to(self.off)
+
+    def off(self, now):
+        if self.controller.lamp_on():
+            return self._to(self.on)
+        set_led(0, 0, 0)
+        return None, self.controller
+
+    def on(self, now):
+        if not self.controller.lamp_on():
+            return self._to(self.off)
+
+        i = self._i
+        wave = self.wave
+        if i == wave.next_boundary:
+            i = wave.refresh(i)
+        table = wave.table
+        set_led(table[i], table[i + 1], table[i + 2])
+        self._i = i + 3
+        return None, self.event
+
+    def __str__(self):
+        return f"{self.__class__.__name__}:{self.transitions}:{self.wave.chunks_generated}"
+
 class Debug:
     def __init__(self):
         self._count = 0
@@ -57,7 +187,12 @@ class Debug:
         print(f"DEBUG: {now}: ", end='')
         print(f"{flicker}, transitions: {flicker.transitions} : {flicker.state.__name__}")
         print(f" actor count: {self._count} {statemachines.count_string()}")
-        return None, statemachines.OneShot(now, statemachines.SECONDS_PER_NS * 3600)
+        print(f" {controller.solar} {OUTPUT} {controller.store} {controller.saved}")
+        gps_machine.dump()
+        tracer.dump()
+        if profiler is not None:
+            profiler.dump()
+        return None, triggers.OneShot(now, statemachines.SECONDS_PER_NS * 3600)
 
     def inc(self):
         self._count += 1
@@ -65,14 +200,36 @@ class Debug:
 # State Machine for top level executive
 
 class Control:
-    def __init__(self, mode_switch, gps_machine, pulser):
+    def __init__(self, mode_switch, gps_machine, pulser, precomputed=None, store=None):
         self._lamp_on = False
         self.pulser = pulser
         self.mode_switch = mode_switch
         self.gps_machine = gps_machine
+        self.precomputed = precomputed
+        self.solar = solarcache.SolarCache()
+
+        # The last fix from before the reset (see persist.py), used
+        # until the GPS gets one. If the RTC is before it the RTC was
+        # reset too, and we can't tell the time without the GPS.
+        self.store = store
+        self.saved = store.load() if store is not None else None
+        if self.saved is not None and self.rtc_seconds() < self.saved.fixed:
+            self.saved = None
+
+    def rtc_seconds(self):
+        return astral.DateSeconds.fromtimestamp(time.localtime())
+
+    def position(self):
+        "(latitude, longitude) from the GPS, or the saved fix; None if neither"
+        if self.gps_machine.has_fix():
+            return self.gps_machine.latitude, self.gps_machine.longitude
+        if self.saved is not None:
+            return self.saved.latitude, self.saved.longitude
+        return None
 
     def start(self, now):
         if self.mode_switch.value:
+            tracer.info(tracer.LAMP_MANUAL, 1)
             return self.on, statemachines.IMMEDATE_TRANSFER
         return self.wait_on_gps, self.pulser
 
@@ -88,6 +245,7 @@ class Control:
         if not self.mode_switch.value:
             # No longer in maual overide, see if we have a fix, if we
             # do it will do the right dispatch.
+            tracer.info(tracer.LAMP_MANUAL, 0)
             return self.wait_on_gps, statemachines.IMMEDATE_TRANSFER
 
         # still in (manual) on state, loop
@@ -96,11 +254,12 @@ class Control:
     def wait_on_gps(self, now):
         if self.mode_switch.value:
             # Maual override, flip on
+            tracer.info(tracer.LAMP_MANUAL, 1)
             return self.on, statemachines.IMMEDATE_TRANSFER
 
-        if self.gps_machine.has_fix():
-            # Mode switch is set to automatic and we have a fix, go to
-            # automatic state.
+        if self.position() is not None:
+            # Mode switch is set to automatic and we have a fix (or
+            # one saved from before a reset), go to automatic state.
             return self.enter_automatic, statemachines.IMMEDATE_TRANSFER
 
         # Mode switch is set to automatic, but we don't have a fix, so
@@ -119,6 +278,7 @@ class Control:
     def auto_poll(self, now):
         if self.mode_switch.value:
             # Maual override, go to (manual) on state
+            tracer.info(tracer.LAMP_MANUAL, 1)
             return self.on, self.pulser
 
         if now >= self.deadline:
@@ -134,60 +294,139 @@ class Control:
         # moving)
         #
         # The GPS state machine takes care of updating the RTC clock with fixes from
-        # from the GPS as they come int.
-        day_seconds = astral.DateSeconds.fromtimestamp(time.localtime())
-
-        latitude         = self.gps_machine.latitude
-        longitude        = self.gps_machine.longitude
-
-        seconds_until_sunrise = astral.time_of_first_after(astral.sunrise_utc, day_seconds, latitude, longitude) - day_seconds
-        seconds_until_sunset  = astral.time_of_first_after(astral.sunset_utc,  day_seconds, latitude, longitude) - day_seconds
-
-        print("sunset:", seconds_until_sunset, "sunrise:", seconds_until_sunrise)
+        # from the GPS as they come int, and of estimating how far it has
+        # drifted since.
+        day_seconds = self.gps_machine.drift.corrected(now, self.rtc_seconds())
+
+        latitude, longitude = self.position()
+        fixed = self.gps_machine.has_fix()
+
+        dark = None
+        scheduled = False
+        if self.precomputed is not None and self.precomputed.near(latitude, longitude):
+            transition = self.precomputed.next_after(day_seconds, (astral.SUNRISE, astral.SUNSET))
+            if transition is not None:
+                change, event = transition
+                dark = event == astral.SUNRISE
+                scheduled = True
+
+        if dark is None and not fixed:
+            # Just booted, go by what we saved if it covers now
+            saved = self.saved.darkness_at(day_seconds)
+            if saved is not None:
+                dark, change = saved
+
+        if dark is None:
+            # No schedule file, or it doesn't cover now/here
+            dark, change = self.solar.darkness_at(day_seconds, latitude, longitude)
+
+        if change is not None and self.store is not None:
+            self.save(now, day_seconds, latitude, longitude, dark, change, scheduled)
+
+        if change is None:
+            # Polar night or midnight sun for the next year (can't
+            # happen outside the poles), check back tomorrow
+            seconds_until_change = astral.SECS_PER_DAY
+        else:
+            seconds_until_change = change - day_seconds
 
-        if (seconds_until_sunrise != 0 and seconds_until_sunrise < seconds_until_sunset) or seconds_until_sunset == 0:
+        self.deadline = now + seconds_until_change * statemachines.SECONDS_PER_NS
+        tracer.info(tracer.LAMP_ON if dark else tracer.LAMP_OFF, int(seconds_until_change))
+        if dark:
             # night
-            self.deadline = now + seconds_until_sunrise * statemachines.SECONDS_PER_NS
             return self.auto_on, statemachines.IMMEDATE_TRANSFER
         else:
             # day
-            self.deadline = now + seconds_until_sunset * statemachines.SECONDS_PER_NS
             return self.auto_off, statemachines.IMMEDATE_TRANSFER
 
+    def save(self, now, day_seconds, latitude, longitude, dark, change, scheduled):
+        # Save the position and the next two transitions for the next
+        # boot. Only written when they change, a couple of times a day.
+        # scheduled is True if change came from the precomputed
+        # schedule, which then has the one after it too.
+        if self.gps_machine.has_fix():
+            ago = (now - self.gps_machine.last_read) // statemachines.SECONDS_PER_NS
+            fixed = day_seconds - ago
+        else:
+            fixed = self.saved.fixed
+        transitions = [(change, not dark)]
+        following = None
+        if scheduled:
+            following = self.precomputed.next_after(change, (astral.SUNRISE, astral.SUNSET))
+        if following is not None:
+            next_change, event = following
+            if (event == astral.SUNSET) == dark:
+                transitions.append((next_change, dark))
+        else:
+            # No schedule (or it ends at change)
+            after, next_change = self.solar.darkness_at(change, latitude, longitude)
+            if next_change is not None and after == (not dark):
+                transitions.append((next_change, dark))
+        self.saved = persist.Saved(latitude, longitude, fixed, transitions)
+        self.store.save(self.saved)
+
     def __str__(self):
         return f"{self.__class__.__name__}:{self._lamp_on}:{self.mode_switch.value}"
 
-#
-# Hardware Setup
-#
-
-mode_switch = digitalio.DigitalInOut(board.D9)
-mode_switch.switch_to_input(pull=digitalio.Pull.UP)
-
-#
-# Turn on Propmaker Board
-#
-enable = digitalio.DigitalInOut(board.D10)
-enable.direction = digitalio.Direction.OUTPUT
-enable.value = True
-
-# POST
-blink(1, MAX, 0,     0)
-blink(1,   0, MAX,   0)
-blink(1,   0,   0, MAX)
-blink(1, MAX, MAX, MAX)
-
-gps_machine = gps.GPS(debug=True, reset=1)
-controller = Control(mode_switch, gps_machine, statemachines.Pulser(0.5))
-flicker_policy = flicker.FlickerPolicy(index_bottom=64,
-                                       index_min=int(MAX/4),
-                                       index_max=MAX)
-flicker = BigFlicker(statemachines.Pulser(0.01), flicker_policy, controller)
-
-statemachines.register_machine(gps_machine, controller, flicker)
-
-
-debugger = Debug()
-statemachines.register_machine(debugger)
-
-statemachines.run((debugger.inc,), dump_interval=3600)
+def setup():
+    """Set up the hardware and build the machines, returns (gps_machine,
+    controller, flicker)
+    """
+    # Debug reads these
+    global gps_machine, controller, flicker
+
+    #
+    # Hardware Setup
+    #
+
+    mode_switch = digitalio.DigitalInOut(board.D9)
+    mode_switch.switch_to_input(pull=digitalio.Pull.UP)
+
+    #
+    # Turn on Propmaker Board
+    #
+    enable = digitalio.DigitalInOut(board.D10)
+    enable.direction = digitalio.Direction.OUTPUT
+    enable.value = True
+
+    # POST
+    blink(1, MAX, 0,     0)
+    blink(1,   0, MAX,   0)
+    blink(1,   0,   0, MAX)
+    blink(1, MAX, MAX, MAX)
+
+    # Optional precomputed schedule, see schedule.py
+    try:
+        precomputed = schedule.Schedule.open("schedule.bin")
+    except (OSError, schedule.ScheduleError) as exc:
+        print("No precomputed schedule:", exc)
+        precomputed = None
+
+    gps_machine = gps.GPS(debug=True, reset=1, builtin_parser=True)
+    controller = Control(mode_switch, gps_machine, triggers.Pulser(0.5), precomputed,
+                         persist.Store(microcontroller.nvm))
+    flicker_policy = flicker.FlickerPolicy(index_bottom=64,
+                                           index_min=int(MAX/4),
+                                           index_max=MAX)
+    if TABLE_FLICKER:
+        flicker = TableFlicker(triggers.Pulser(0.01), waveform.Waveform(flicker_policy), controller)
+    else:
+        flicker = BigFlicker(triggers.Pulser(0.01), flicker_policy, controller)
+    return gps_machine, controller, flicker
+
+def main():
+    machines = setup()
+    if profiler is not None:
+        machines = tuple(profiler.machine(machine) for machine in machines)
+    statemachines.register_machine(*machines)
+
+
+    debugger = Debug()
+    statemachines.register_machine(debugger)
+
+    statemachines.run((debugger.inc,), dump_interval=3600)
+
+# CircuitPython runs code.py as __main__; anything else (see sim/,
+# allocbudget.py) is importing it for the classes.
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# Index of the dark intervals (sunset to sunrise, or dusk to dawn for a
+# given depression) at one location, built from astral's event
+# calculations. Answers "is it dark at t?" and "when does that change?"
+# with a bisect over sorted interval lists, and copes with days when
+# the sun never rises or never sets (polar night / midnight sun) by
+# treating the whole solar day as dark or light.
+#
+# The index only covers a window of time. It is extended a few days at
+# a time as queries move forward, and intervals more than a day before
+# the latest query are dropped, so memory stays bounded.
+
+import astral
+
+def _bisect_right(a, x):
+    # CircuitPython doesn't have the bisect module
+    lo = 0
+    hi = len(a)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if x < a[mid]:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+# Points are only committed once no later day can produce an earlier
+# one. A day's events are within 12 hours of its solar noon; allow for
+# solar noon drifting from day to day.
+_MARGIN = 3600
+
+class DarknessIndex:
+    def __init__(self, observer, start, depression=None, horizon_days=7):
+        """Index darkness at an astral.Observer's location from (at
+        least) DateSeconds start. With depression None darkness runs
+        from sunset to sunrise, otherwise from dusk to dawn at that
+        depression (a number of degrees or one of astral's named
+        depressions).
+        """
+        self.observer = observer
+        self.horizon_days = horizon_days
+
+        if depression is None:
+            self._zenith = 90 + 0.833
+        else:
+            self._zenith = astral._depression(depression) + 90
+
+        # Times are kept as seconds since _epoch so they stay small ints
+        self._next_day = start.date.toordinal() - 2
+        self._epoch = astral.DateSeconds(astral.Date.fromordinal(self._next_day), 0)
+
+        self._starts = []       # sorted dark interval starts
+        self._ends = []         # and matching ends
+        self._open = None       # start of a dark interval with no end yet
+        self._dark = None       # state after the last committed point
+        self._pending = []      # (time, dark) points not yet committed
+        self._valid_from = None # first time the index knows about
+        self._valid_until = 0   # and the first it doesn't
+
+        self._extend_to(start - self._epoch)
+
+    def _commit(self, t, dark):
+        if self._dark is None:
+            self._valid_from = t
+            if dark:
+                self._open = t
+        elif dark and not self._dark:
+            self._open = t
+        elif not dark and self._dark:
+            self._starts.append(self._open)
+            self._ends.append(t)
+            self._open = None
+        self._dark = dark
+
+    def _add_day(self):
+        date = astral.Date.fromordinal(self._next_day)
+        self._next_day += 1
+
+        eqtime, declination = astral._solar_terms(date)
+        observer = self.observer
+        noon = observer._event_time(0, 0, date, eqtime, declination) - self._epoch
+
+        try:
+            rise_time = observer._event_time(self._zenith, astral.SUN_RISING, date,
+                                             eqtime, declination)
+            set_time = observer._event_time(self._zenith, astral.SUN_SETTING, date,
+                                            eqtime, declination)
+            self._pending.append((rise_time - self._epoch, False))
+            self._pending.append((set_time - self._epoch, True))
+        except ValueError:
+            # The sun doesn't cross the zenith today. If it's below it
+            # at noon it is dark all (solar) day, otherwise light.
+            noon_zenith = abs(observer.latitude - declination)
+            self._pending.append((noon - astral.SECS_PER_DAY // 2, noon_zenith > self._zenith))
+
+        self._pending.sort()
+        limit = noon + astral.SECS_PER_DAY // 2 - _MARGIN
+        while self._pending and self._pending[0][0] < limit:
+            self._commit(*self._pending.pop(0))
+        self._valid_until = limit
+
+    def _extend_to(self, t):
+        # Make sure the index covers (relative) time t, plus a horizon
+        # beyond it so the next few queries don't have to.
+        if t < self._valid_until:
+            return
+
+        target = t + self.horizon_days * astral.SECS_PER_DAY
+        while self._valid_until <= target:
+            self._add_day()
+
+    def _relative(self, t):
+        # DateSeconds -> relative time for a query, which also extends
+        # the index and drops intervals that ended over a day before.
+        t = t - self._epoch
+        self._extend_to(t)
+        if t < self._valid_from:
+            raise ValueError("%s is before the start of the index" % (self._epoch + t))
+
+        drop = _bisect_right(self._ends, t - astral.SECS_PER_DAY)
+        if drop:
+            del self._starts[:drop]
+            del self._ends[:drop]
+            self._valid_from = t - astral.SECS_PER_DAY
+
+        return t
+
+    def _is_dark(self, t):
+        i = _bisect_right(self._starts, t)
+        if i and t < self._ends[i - 1]:
+            return True
+        return self._open is not None and self._open <= t
+
+    def is_dark(self, t):
+        "True if it is dark at DateSeconds t"
+        return self._is_dark(self._relative(t))
+
+    def next_change(self, t, max_days=366):
+        """Return the DateSeconds, strictly after t, at which it next
+        goes from dark to light or light to dark, or None if that
+        doesn't happen within max_days.
+        """
+        t = self._relative(t)
+        limit = t + max_days * astral.SECS_PER_DAY
+        while True:
+            # Next interval boundary after t
+            i = _bisect_right(self._starts, t)
+            if i and t < self._ends[i - 1]:
+                return self._epoch + self._ends[i - 1]
+            if i < len(self._starts):
+                return self._epoch + self._starts[i]
+            if self._open is not None and t < self._open:
+                return self._epoch + self._open
+
+            # Nothing known after t, look further ahead
+            if self._valid_until > limit:
+                return None
+            self._extend_to(self._valid_until)
+
+    def dark_seconds(self, start, end):
+        "Number of seconds it is dark between DateSeconds start and end"
+        start = self._relative(start)
+        end = end - self._epoch
+        self._extend_to(end)
+
+        total = 0
+        i = max(_bisect_right(self._starts, start) - 1, 0)
+        while i < len(self._starts) and self._starts[i] < end:
+            total += max(0, min(end, self._ends[i]) - max(start, self._starts[i]))
+            i += 1
+        if self._open is not None and self._open < end:
+            total += end - max(start, self._open)
+        return total
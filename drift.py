@@ -0,0 +1,93 @@
+# Linear model of the RTC's drift against GPS time.
+#
+# Each time the GPS sets the RTC we learn how far off it had got
+# (the correction, GPS - RTC, in whole seconds) since the previous
+# time it was set. The drift rate is estimated as the sum of the
+# corrections over the sum of the intervals, both decayed so the
+# estimate follows slow changes (temperature, ageing). That gives a
+# corrected time between syncs, and lets the GPS be left alone for as
+# long as the predicted error stays inside an error budget.
+#
+# Times are in the time.monotonic_ns() timebase, like the `now` the
+# state machines are called with.
+
+import statemachines
+
+# A correction bigger than this (as a fraction of the interval) means
+# the RTC was reset or lost power rather than drifted; start over.
+MAX_RATE = 0.001
+
+# The correction is the GPS's whole second less the RTC's (truncated)
+# one, read a little after the second started, which overstates it by
+# half a second on average.
+CORRECTION_BIAS = 0.5
+
+class DriftModel:
+    def __init__(self, error_budget=10, min_interval=3600, max_interval=86400, decay=0.9):
+        """error_budget is the RTC error (seconds) allowed to build up
+        between syncs; sync intervals (seconds) are kept between
+        min_interval and max_interval, and at most double each time.
+        """
+        self.error_budget = error_budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.decay = decay
+
+        self.rate = 0.0         # seconds gained (GPS - RTC) per second
+        self.samples = 0
+        self.last_sync = -1     # when the RTC was last set from the GPS
+        self.interval = min_interval
+
+        self._corrections = 0.0 # decayed sums
+        self._elapsed = 0.0
+
+    def sync(self, now, correction, measured_at):
+        """The GPS set the RTC, last at now. Its first correction since
+        the previous sync was correction seconds, made at measured_at.
+        """
+        if self.last_sync >= 0:
+            elapsed = (measured_at - self.last_sync) / statemachines.SECONDS_PER_NS
+            if elapsed <= 0:
+                pass
+            elif abs(correction) > elapsed * MAX_RATE:
+                self.reset()
+            else:
+                self._corrections = self._corrections * self.decay + correction - CORRECTION_BIAS
+                self._elapsed = self._elapsed * self.decay + elapsed
+                self.rate = self._corrections / self._elapsed
+                self.samples += 1
+        self.last_sync = now
+
+    def reset(self):
+        self.rate = 0.0
+        self.samples = 0
+        self._corrections = 0.0
+        self._elapsed = 0.0
+        self.interval = self.min_interval
+
+    def correction(self, now):
+        "Seconds to add to the RTC's time at now"
+        if self.samples == 0 or self.last_sync < 0:
+            return 0
+        return round(self.rate * (now - self.last_sync) / statemachines.SECONDS_PER_NS)
+
+    def corrected(self, now, t):
+        "RTC time t (anything seconds can be added to) corrected for drift at now"
+        return t + self.correction(now)
+
+    def next_interval(self):
+        """Seconds until the next sync. The corrections are whole
+        seconds, so the rate is only known to about 1 / (time observed);
+        allow for that on top of the estimate.
+        """
+        if self.samples == 0:
+            interval = self.min_interval
+        else:
+            bound = abs(self.rate) + 1 / self._elapsed
+            interval = self.error_budget / bound
+            interval = max(self.min_interval, min(interval, 2 * self.interval, self.max_interval))
+        self.interval = int(interval)
+        return self.interval
+
+    def __str__(self):
+        return f"{self.__class__.__name__}:{self.rate * 1e6:.1f}ppm/{self.samples}/{self.interval}s"
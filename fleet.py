@@ -0,0 +1,295 @@
+# Schedules for a whole fleet of lamps, computed on a host. Reads the
+# devices, one a line, from a CSV file (with a header) or JSON lines:
+#
+#   id,latitude,longitude,start,end
+#   lamp-0001,40.0,-75.0,2025-01-01,2025-12-31
+#
+# start and end are inclusive UTC dates and may be left out (or empty)
+# if --start/--end are given. Writes, for each device and day, a CSV row
+#
+#   id,date,sunrise,sunset[,dawn,dusk]
+#
+# with the times in UTC (empty where the event doesn't happen), or with
+# --schedules DIR a schedule.py file DIR/<id>.bin per device instead:
+#
+#   python fleet.py devices.csv [-o rows.csv | --schedules DIR] [--twilight]
+#                   [--start DATE] [--end DATE] [--jobs N] [--chunk N]
+#
+# The devices are read, and the results written, a chunk at a time, with
+# at most 2 * jobs chunks being worked on, so memory stays the same
+# however big the fleet is. Each chunk is worked out by astral_batch
+# (which matches astral.py to the second) in a worker process, with the
+# per-day terms shared between devices with the same date range. Output
+# is in input order. Progress and throughput go to stderr.
+
+import argparse
+import collections
+import concurrent.futures
+import csv
+import datetime
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import astral
+import astral_batch
+import schedule
+
+# Seconds in astral.DateSeconds.toordinal()'s timebase at 1970-01-01
+_UNIX_EPOCH = astral.Date(1970, 1, 1).toordinal() * astral.SECS_PER_DAY
+
+_BATCH = {
+    astral.SUNRISE: astral_batch.sunrise_utc,
+    astral.SUNSET: astral_batch.sunset_utc,
+    astral.DAWN: astral_batch.dawn_utc,
+    astral.DUSK: astral_batch.dusk_utc,
+}
+
+class FleetError(Exception):
+    pass
+
+def _date(text, where):
+    try:
+        return datetime.date.fromisoformat(text).toordinal()
+    except (TypeError, ValueError):
+        raise FleetError("%s: bad date %r" % (where, text))
+
+def _device(record, where, start, end):
+    # (id, latitude, longitude, first day ordinal, days) from a record
+    try:
+        device_id = str(record["id"])
+        latitude = float(record["latitude"])
+        longitude = float(record["longitude"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise FleetError("%s: bad device %r (%s)" % (where, record, e))
+    if not device_id or "/" in device_id or "\\" in device_id or device_id.startswith("."):
+        raise FleetError("%s: bad device id %r" % (where, device_id))
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise FleetError("%s: %s is at (%s, %s)" % (where, device_id, latitude, longitude))
+
+    first = _date(record.get("start") or start, where)
+    last = _date(record.get("end") or end, where)
+    if last < first:
+        raise FleetError("%s: %s ends before it starts" % (where, device_id))
+    return device_id, latitude, longitude, first, last - first + 1
+
+def read_devices(f, name, start=None, end=None, jsonl=False):
+    "Yield the devices in open file f (called name in errors)"
+    if jsonl:
+        for n, line in enumerate(f, 1):
+            if line.strip():
+                where = "%s:%d" % (name, n)
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise FleetError("%s: %s" % (where, e))
+                if not isinstance(record, dict):
+                    raise FleetError("%s: not an object" % where)
+                yield _device(record, where, start, end)
+    else:
+        reader = csv.DictReader(f)
+        for record in reader:
+            yield _device(record, "%s:%d" % (name, reader.line_num), start, end)
+
+def chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _events(devices, kinds, depression):
+    # Yield (device indexes, first day ordinal, days, [(seconds, never)
+    # per kind], each shaped days x devices) for the devices in groups
+    # with the same date range
+    groups = collections.defaultdict(list)
+    for i, device in enumerate(devices):
+        groups[device[3], device[4]].append(i)
+
+    for (first, days), indexes in groups.items():
+        ordinals, latitudes, longitudes = astral_batch.grid(
+            astral.Date.fromordinal(first), days,
+            [devices[i][1] for i in indexes], [devices[i][2] for i in indexes])
+        events = []
+        for kind in kinds:
+            if kind in (astral.DAWN, astral.DUSK):
+                events.append(_BATCH[kind](ordinals, latitudes, longitudes, depression))
+            else:
+                events.append(_BATCH[kind](ordinals, latitudes, longitudes))
+        yield indexes, first, days, events
+
+def _field(value):
+    "value as a CSV field, quoted if it has to be"
+    text = io.StringIO()
+    csv.writer(text, lineterminator="\r\n").writerow((value,))
+    return text.getvalue()[:-2]
+
+def _rows(devices, kinds, depression):
+    # The CSV text for a chunk of devices. Only the id can need quoting,
+    # the dates and times are all digits and punctuation.
+    texts = [None] * len(devices)
+    for indexes, first, days, events in _events(devices, kinds, depression):
+        dates = np.datetime_as_string(
+            (first + np.arange(days) - _UNIX_EPOCH // astral.SECS_PER_DAY).astype("datetime64[D]"))
+        dates = dates.tolist()
+        columns = []
+        for seconds, never in events:
+            times = np.datetime_as_string((seconds - _UNIX_EPOCH).astype("datetime64[s]"),
+                                          timezone="UTC")
+            # Per device lists of str, much quicker to join than numpy's
+            columns.append(np.where(never, "", times).T.tolist())
+        for column, i in enumerate(indexes):
+            ids = (_field(devices[i][0]),) * days
+            rows = zip(ids, dates, *(times[column] for times in columns))
+            texts[i] = "\n".join(map(",".join, rows)) + "\n"
+    return "".join(texts)
+
+def _schedules(devices, kinds, depression, directory):
+    # Write a chunk of devices' schedule files
+    for indexes, first, days, events in _events(devices, kinds, depression):
+        # schedule.py's records are seconds from midnight before the first day
+        base = (first - 1) * astral.SECS_PER_DAY
+        records = np.empty((days, len(indexes), len(kinds)), dtype="<u4")
+        for k, (seconds, never) in enumerate(events):
+            records[:, :, k] = np.where(never, schedule.NEVER, seconds - base)
+        for column, i in enumerate(indexes):
+            device_id, latitude, longitude = devices[i][:3]
+            header = schedule.pack_header(latitude, longitude, first, days, kinds, depression)
+            with open(os.path.join(directory, device_id + ".bin"), "wb") as f:
+                f.write(header)
+                f.write(records[:, column, :].tobytes())
+    return ""
+
+def work(devices, kinds, depression, directory=None):
+    """Work out a chunk of devices, returning (CSV text, or "" if
+    directory is given and the schedule files were written there,
+    devices, device days)
+    """
+    if directory is None:
+        text = _rows(devices, kinds, depression)
+    else:
+        text = _schedules(devices, kinds, depression, directory)
+    return text, len(devices), sum(device[4] for device in devices)
+
+class Progress:
+    "Counts, and reports to stderr every interval seconds"
+
+    def __init__(self, interval=2.0, stream=sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.devices = 0
+        self.device_days = 0
+        self.started = time.perf_counter()
+        self._reported = self.started
+
+    def add(self, devices, device_days):
+        self.devices += devices
+        self.device_days += device_days
+        now = time.perf_counter()
+        if self.interval and now - self._reported >= self.interval:
+            self._reported = now
+            self.report("\r", "")
+
+    def report(self, start="", end="\n"):
+        elapsed = time.perf_counter() - self.started
+        rate = self.device_days / elapsed if elapsed > 0 else 0.0
+        self.stream.write("%s%d devices, %d device days in %.1fs, %.0f device days/s%s" % (
+            start, self.devices, self.device_days, elapsed, rate, end))
+        self.stream.flush()
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return {"devices": self.devices, "device_days": self.device_days, "seconds": elapsed,
+                "device_days_per_second": self.device_days / elapsed if elapsed > 0 else 0.0}
+
+def run(devices, out, kinds=(astral.SUNRISE, astral.SUNSET), depression="civil",
+        directory=None, jobs=None, chunk=256, progress=None):
+    """Work out devices (an iterable, as from read_devices) in chunks
+    across jobs worker processes, writing CSV rows to out (a header
+    first) or schedule files to directory. jobs=1 works in this process.
+    """
+    if directory is None:
+        out.write(",".join(("id", "date") + tuple(kinds)) + "\n")
+    if progress is None:
+        progress = Progress(interval=0)
+
+    def finish(result):
+        text, count, device_days = result
+        if text:
+            out.write(text)
+        progress.add(count, device_days)
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        for devices_chunk in chunks(devices, chunk):
+            finish(work(devices_chunk, kinds, depression, directory))
+        return progress
+
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        pending = collections.deque()
+        for devices_chunk in chunks(devices, chunk):
+            if len(pending) >= 2 * jobs:
+                finish(pending.popleft().result())
+            pending.append(executor.submit(work, devices_chunk, kinds, depression, directory))
+        while pending:
+            finish(pending.popleft().result())
+    return progress
+
+def main():
+    parser = argparse.ArgumentParser(description="compute sunrise/sunset schedules for a fleet of lamps")
+    parser.add_argument("devices", help="CSV or JSON lines (.jsonl) file of devices, - for stdin")
+    parser.add_argument("-o", "--output", help="CSV file to write (default stdout)")
+    parser.add_argument("--schedules", metavar="DIR",
+                        help="write a schedule.py file per device here instead of CSV")
+    parser.add_argument("--jsonl", action="store_true", help="devices are JSON lines (the default for .jsonl)")
+    parser.add_argument("--start", help="first day (YYYY-MM-DD) for devices without one")
+    parser.add_argument("--end", help="last day (YYYY-MM-DD) for devices without one")
+    parser.add_argument("--twilight", action="store_true", help="include dawn and dusk")
+    parser.add_argument("--depression", default="civil", help="dawn/dusk depression (default civil)")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default one per CPU)")
+    parser.add_argument("--chunk", type=int, default=256, help="devices per work item")
+    parser.add_argument("--quiet", action="store_true", help="no progress on stderr")
+    parser.add_argument("--stats", help="write the throughput as JSON here")
+    args = parser.parse_args()
+
+    kinds = (astral.SUNRISE, astral.SUNSET)
+    if args.twilight:
+        kinds += (astral.DAWN, astral.DUSK)
+    try:
+        depression = float(args.depression)
+    except ValueError:
+        depression = args.depression
+    if args.schedules is not None:
+        os.makedirs(args.schedules, exist_ok=True)
+
+    jsonl = args.jsonl or args.devices.endswith(".jsonl")
+    f = sys.stdin if args.devices == "-" else open(args.devices, newline="")
+    out = sys.stdout if args.output is None else open(args.output, "w", newline="")
+    progress = Progress(interval=0 if args.quiet else 2.0)
+    try:
+        run(read_devices(f, args.devices, args.start, args.end, jsonl), out, kinds,
+            depression, args.schedules, args.jobs, args.chunk, progress)
+    except FleetError as e:
+        print("fleet.py:", e, file=sys.stderr)
+        return 1
+    finally:
+        if f is not sys.stdin:
+            f.close()
+        if out is not sys.stdout:
+            out.close()
+    if not args.quiet:
+        progress.report("\r")
+    if args.stats is not None:
+        with open(args.stats, "w") as stats:
+            json.dump(progress.summary(), stats, indent=1)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,445 @@
+import array
 import board
 import busio
 import time
 import rtc
 
-import adafruit_gps
-
 import statemachines
 
+import drift
+import tracer
+import triggers
+
+try:
+    import adafruit_gps
+except ImportError:
+    # Only the built-in RMCReceiver (below) is available
+    adafruit_gps = None
+
 def format_ts(ts):
     return f"{ts.tm_year}-{ts.tm_mon:02}-{ts.tm_mday:02}T{ts.tm_hour:02}:{ts.tm_min:02}:{ts.tm_sec:02}"
 
-# The interface of the adafruit_gps.GPS class makes it difficult to
-# tell when there is a new timefix. Subclass that overrides
-# _update_timestamp_utc and uses that call as a signal that a) a new
-# timestamp is available, and b) the RTC should be updated/
+def timestamp(ts):
+    # struct_time -> seconds, ignoring any DST flag (on the host)
+    return int(time.mktime((ts.tm_year, ts.tm_mon, ts.tm_mday, ts.tm_hour, ts.tm_min, ts.tm_sec, 0, 0, 0)))
+
+def set_rtc(clock, datetime):
+    # clock is an rtc.RTC(), or a stand-in for one. Returns the
+    # correction (new - old) in seconds.
+    old_time = clock.datetime
+    clock.datetime = datetime
+    return timestamp(datetime) - timestamp(old_time)
+
+# Fixed size record of the last few fixes, for Debug to dump instead of
+# printing as they happen. Each column is an array, the rows form a
+# ring.
+#
+class FixTelemetry:
+    FIELDS = ("time_to_fix_ms", # from the first poll of the attempt
+              "polls",          # GPS.poll calls it took
+              "satellites",     # -1 if the receiver doesn't say
+              "quality",        # GGA style fix quality
+              "rtc_correction") # seconds, first RTC update of the attempt
+
+    def __init__(self, size=32):
+        self.size = size
+        self._columns = tuple(array.array('l', [0] * size) for _ in self.FIELDS)
+        self._next = 0
+        self.count = 0  # fixes recorded, including those overwritten
+
+    def record(self, time_to_fix_ms, polls, satellites, quality, rtc_correction):
+        i = self._next
+        columns = self._columns
+        columns[0][i] = time_to_fix_ms
+        columns[1][i] = polls
+        columns[2][i] = satellites
+        columns[3][i] = quality
+        columns[4][i] = rtc_correction
+        self._next = (i + 1) % self.size
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def _index(self, n):
+        # ring index of the n'th oldest row held
+        return (self._next - len(self) + n) % self.size
+
+    def row(self, n):
+        "n'th oldest fix held, as a tuple in FIELDS order"
+        if not 0 <= n < len(self):
+            raise IndexError("telemetry row out of range")
+        i = self._index(n)
+        return tuple(column[i] for column in self._columns)
+
+    def summary(self, field):
+        "(min, mean, max) of field over the fixes held, or None"
+        if not len(self):
+            return None
+        column = self._columns[self.FIELDS.index(field)]
+        low = high = total = column[self._index(0)]
+        for n in range(1, len(self)):
+            value = column[self._index(n)]
+            low = min(low, value)
+            high = max(high, value)
+            total += value
+        return low, total / len(self), high
+
+    def dump(self):
+        print(f"{self.count} fixes, last {len(self)}: " + " ".join(self.FIELDS))
+        for n in range(len(self)):
+            print(" ", " ".join(str(value) for value in self.row(n)))
+        for field in self.FIELDS:
+            summary = self.summary(field)
+            if summary:
+                print(f"  {field}: min {summary[0]} mean {summary[1]:.1f} max {summary[2]}")
+
+if adafruit_gps is not None:
+    # The interface of the adafruit_gps.GPS class makes it difficult to
+    # tell when there is a new timefix. Subclass that overrides
+    # _update_timestamp_utc and uses that call as a signal that a) a new
+    # timestamp is available, and b) the RTC should be updated/
+    #
+    class TimeSettingGPS(adafruit_gps.GPS):
+        def __init__(self, uart, debug=False, rtc_clock=None):
+            adafruit_gps.GPS.__init__(self, uart, debug=debug)
+            self.rtc_clock = rtc_clock if rtc_clock is not None else rtc.RTC()
+
+            self.rtc_correction = None
+
+        def reset_input(self):
+            self._uart.reset_input_buffer()
+
+        def _update_timestamp_utc(self, time_utc, date=None):
+            adafruit_gps.GPS._update_timestamp_utc(self, time_utc, date)
+            if date is not None:
+                correction = set_rtc(self.rtc_clock, self.datetime)
+                if self.rtc_correction is None:
+                    self.rtc_correction = correction
+                    tracer.info(tracer.GPS_RTC_SET, correction)
+
+# Built-in NMEA receiver that only understands RMC sentences (which is
+# all we ask the module for, see GPS below). adafruit_gps.GPS reads
+# each sentence into new bytes/str objects, splits it into a list and
+# parses floats from the pieces, which churns the heap every poll. This
+# reads from the UART into a preallocated buffer and checks/parses
+# sentences in place, so the only allocations are the odd small
+# memoryview slice and the struct_time built when asked for datetime.
+#
+# It has the parts of the adafruit_gps.GPS interface that GPS uses.
+#
+
+NMEA_MAX = 82 # longest legal sentence, including $ and \r\n
+
+_DOLLAR = 36
+_STAR = 42
+_COMMA = 44
+_DOT = 46
+_CR = 13
+_LF = 10
+
+def _hex(c):
+    # Value of ASCII hex digit c, or -1
+    if 48 <= c <= 57:
+        return c - 48
+    if 65 <= c <= 70:
+        return c - 55
+    if 97 <= c <= 102:
+        return c - 87
+    return -1
+
+class RMCReceiver:
+    def __init__(self, uart, debug=False, buffer_size=2 * NMEA_MAX):
+        self._uart = uart
+        self.debug = debug
+
+        self._buf = bytearray(buffer_size)
+        self._view = memoryview(self._buf)
+        self._fill = 0      # bytes in _buf
+        self._scan = 0      # bytes of _buf already searched for \n
+
+        # Start of each field (just after its comma) in the current
+        # sentence; a field ends one before where the next starts
+        self._fields = [0] * 13
+
+        self.has_fix = False
+        self.fix_quality = 0
+        self.satellites = None      # RMC doesn't say
+        self.latitude = None
+        self.longitude = None
+        self.timestamp_utc = None   # hhmmss, as an int
+        self.date_utc = None        # ddmmyy, as an int
+        self._datetime = None
+
+        # Counters
+        self.bytes_read = 0
+        self.sentences = 0          # with a good checksum, of any type
+        self.rmc_sentences = 0
+        self.checksum_errors = 0
+        self.overruns = 0           # lines too long for the buffer
+
+    def send_command(self, command, add_checksum=True):
+        uart = self._uart
+        uart.write(b'$')
+        uart.write(command)
+        if add_checksum:
+            checksum = 0
+            for c in command:
+                checksum ^= c
+            uart.write(bytes("*%02X" % checksum, 'ascii'))
+        uart.write(b'\r\n')
+
+    def update(self):
+        """Read whatever the UART has buffered and parse any complete
+        sentences. Returns True if an RMC sentence was parsed.
+        """
+        uart = self._uart
+        buf = self._buf
+        fill = self._fill
+
+        n = min(uart.in_waiting, len(buf) - fill)
+        if n:
+            n = uart.readinto(self._view[fill:fill + n]) or 0
+            self.bytes_read += n
+            fill += n
+
+        parsed = False
+        start = 0
+        for i in range(self._scan, fill):
+            if buf[i] == _LF:
+                if self._sentence(start, i):
+                    parsed = True
+                start = i + 1
+
+        if start:
+            # Move the partial sentence to the front
+            for i in range(start, fill):
+                buf[i - start] = buf[i]
+            fill -= start
+        elif fill == len(buf):
+            # No end of line in a full buffer, drop it
+            self.overruns += 1
+            tracer.error(tracer.GPS_OVERRUN, self.overruns)
+            fill = 0
+
+        self._fill = fill
+        self._scan = fill
+        return parsed
+
+    def reset_input(self):
+        "Discard anything received but not yet parsed"
+        self._uart.reset_input_buffer()
+        self._fill = 0
+        self._scan = 0
+
+    def _sentence(self, start, end):
+        # Check and parse the line in _buf[start:end]
+        buf = self._buf
+        while start < end and buf[start] != _DOLLAR:
+            start += 1
+        if end > start and buf[end - 1] == _CR:
+            end -= 1
+
+        star = end - 3
+        if star <= start or buf[star] != _STAR:
+            self.checksum_errors += 1
+            tracer.info(tracer.GPS_CHECKSUM, self.checksum_errors)
+            return False
+
+        checksum = 0
+        for i in range(start + 1, star):
+            checksum ^= buf[i]
+        if checksum != (_hex(buf[star + 1]) << 4 | _hex(buf[star + 2])):
+            self.checksum_errors += 1
+            tracer.info(tracer.GPS_CHECKSUM, self.checksum_errors)
+            return False
+
+        self.sentences += 1
+        tracer.debug(tracer.GPS_SENTENCE, end - start)
+
+        # $--RMC,
+        if star - start < 7 or buf[start + 3] != 82 or buf[start + 4] != 77 or buf[start + 5] != 67 or buf[start + 6] != _COMMA:
+            return False
+
+        fields = self._fields
+        count = 0
+        for i in range(start + 6, star):
+            if buf[i] == _COMMA:
+                if count == len(fields):
+                    break
+                fields[count] = i + 1
+                count += 1
+        if count < 9:
+            return False
+        if count < len(fields):
+            fields[count] = star + 1
+        self._field_count = count
+
+        self.rmc_sentences += 1
+        self._parse_rmc(fields)
+        return True
+
+    def _field_length(self, n):
+        return self._fields[n + 1] - 1 - self._fields[n]
+
+    def _digits(self, start, end):
+        # Value of the ASCII digits in _buf[start:end], or -1
+        buf = self._buf
+        value = 0
+        for i in range(start, end):
+            c = buf[i] - 48
+            if c < 0 or c > 9:
+                return -1
+            value = value * 10 + c
+        return value
+
+    def _coordinate(self, n, negative):
+        # Degrees from the [d]ddmm.mmmm field n and the hemisphere
+        # field after it, or None if either is empty
+        start = self._fields[n]
+        end = start + self._field_length(n)
+        if start == end or self._field_length(n + 1) != 1:
+            return None
+
+        buf = self._buf
+        dot = start
+        while dot < end and buf[dot] != _DOT:
+            dot += 1
+        whole = self._digits(start, dot)
+        fraction = self._digits(dot + 1, end) if dot < end else 0
+        if whole < 0 or fraction < 0:
+            return None
+
+        scale = 10 ** max(end - dot - 1, 0)
+        degrees = whole // 100 + ((whole % 100) * scale + fraction) / (60 * scale)
+        if buf[self._fields[n + 1]] == negative:
+            degrees = -degrees
+        return degrees
+
+    def _parse_rmc(self, fields):
+        # 0 time, 1 status, 2 lat, 3 N/S, 4 lon, 5 E/W, 6 speed,
+        # 7 course, 8 date, ...
+        buf = self._buf
+
+        self.has_fix = self._field_length(1) == 1 and buf[fields[1]] == 65 # A
+        self.fix_quality = 1 if self.has_fix else 0
+        if self.has_fix and self._field_count > 11 and self._field_length(11) == 1:
+            # NMEA 2.3 mode indicator
+            mode = buf[fields[11]]
+            if mode == 68:      # D, differential
+                self.fix_quality = 2
+            elif mode == 69:    # E, estimated
+                self.fix_quality = 6
+        self.latitude = self._coordinate(2, 83)   # S
+        self.longitude = self._coordinate(4, 87)  # W
+
+        time_utc = -1
+        if self._field_length(0) >= 6:
+            time_utc = self._digits(fields[0], fields[0] + 6)
+        if time_utc < 0:
+            return
+
+        date = None
+        if self._field_length(8) == 6:
+            date = self._digits(fields[8], fields[8] + 6)
+            if date < 0:
+                date = None
+
+        self._update_timestamp_utc(time_utc, date)
+
+    def _update_timestamp_utc(self, time_utc, date=None):
+        # Called with each RMC time (hhmmss) and, when the sentence has
+        # one, date (ddmmyy). Subclasses hook this, see TimeSettingRMC.
+        self.timestamp_utc = time_utc
+        if date is not None:
+            self.date_utc = date
+        self._datetime = None
+
+    @property
+    def datetime(self):
+        "UTC time.struct_time of the last RMC time and date, or None"
+        if self._datetime is None and self.timestamp_utc is not None and self.date_utc is not None:
+            t = self.timestamp_utc
+            d = self.date_utc
+            self._datetime = time.struct_time((2000 + d % 100, d // 100 % 100, d // 10000,
+                                               t // 10000, t // 100 % 100, t % 100, 0, 0, -1))
+        return self._datetime
+
+    @property
+    def in_waiting(self):
+        "Bytes waiting in the UART, as adafruit_gps.GPS has"
+        return self._uart.in_waiting
+
+    def __str__(self):
+        return (f"{self.__class__.__name__}:{self.bytes_read} bytes, {self.sentences} sentences, "
+                f"{self.rmc_sentences} RMC, {self.checksum_errors} bad, {self.overruns} overruns")
+
+# Same idea as TimeSettingGPS, for RMCReceiver
 #
-class TimeSettingGPS(adafruit_gps.GPS):
+class TimeSettingRMC(RMCReceiver):
+    def __init__(self, uart, debug=False, rtc_clock=None):
+        RMCReceiver.__init__(self, uart, debug=debug)
+        self.rtc_clock = rtc_clock if rtc_clock is not None else rtc.RTC()
+        self.rtc_correction = None
+
     def _update_timestamp_utc(self, time_utc, date=None):
-        adafruit_gps.GPS._update_timestamp_utc(self, time_utc, date)
+        RMCReceiver._update_timestamp_utc(self, time_utc, date)
         if date is not None:
-            old_time = time.localtime()
-            rtc.RTC().datetime = self.datetime
-            print(f"Updated RTC to {format_ts(self.datetime)}, was {format_ts(old_time)} ({statemachines.monotonic_ns_calls} {statemachines.count_string()})")
+            correction = set_rtc(self.rtc_clock, self.datetime)
+            if self.rtc_correction is None:
+                self.rtc_correction = correction
+                tracer.info(tracer.GPS_RTC_SET, correction)
+
+# Polling policy while waiting for a fix. The module sends an RMC
+# sentence every RMC_PERIOD_MS (see PMTK220 below), which takes about
+# 75ms to arrive at 9600 baud, more than the UART's 64 byte buffer
+# holds. When we first see a sentence arriving, work out when it
+# started from how many bytes are waiting; sleep until WAKE_LEAD
+# before the next is due, then poll at POLL_ARRIVING until it has
+# arrived. Otherwise (no signal, or a late sentence) back off
+# exponentially from POLL_MIN to POLL_MAX. All in ns.
+#
+RMC_PERIOD_MS = 1000
+RMC_PERIOD    = RMC_PERIOD_MS * statemachines.SECONDS_PER_NS // 1000
+BYTE_TIME     = 10 * statemachines.SECONDS_PER_NS // 9600
+WAKE_LEAD     = int(0.1 * statemachines.SECONDS_PER_NS)
+POLL_ARRIVING = int(0.04 * statemachines.SECONDS_PER_NS)
+POLL_MIN      = int(0.05 * statemachines.SECONDS_PER_NS)
+POLL_MAX      = int(5 * statemachines.SECONDS_PER_NS)
+
+# Power management between syncs. In standby (PMTK161,0) the module
+# stops sending and any byte on its RX wakes it; backup (PMTK225,4)
+# draws less but needs the FORCE_ON pin raised to wake. Either way it
+# keeps its almanac/ephemeris and RTC, so waking is a hot start (or a
+# warm one once the ephemeris is a few hours old). Wake early enough
+# that the fix is in by the time the sync is due: WAKE_LEAD_FACTOR
+# times the typical start (an average of recent ones) clamped to
+# MIN_WAKE_LEAD..MAX_WAKE_LEAD seconds.
+#
+POWER_STANDBY = 'standby'
+POWER_BACKUP  = 'backup'
+
+STANDBY_COMMAND = b'PMTK161,0'
+BACKUP_COMMAND  = b'PMTK225,4'
+WAKE_COMMAND    = b'PMTK000'  # test packet, any byte will do
+
+HOT_START        = 15 # seconds, longer starts are counted as warm
+WAKE_LEAD_FACTOR = 2
+MIN_WAKE_LEAD    = 5
+MAX_WAKE_LEAD    = 300
 
 class GPS:
-    def __init__(self, debug=False, reset=False, tx=board.TX, rx=board.RX):
-        uart = busio.UART(tx, rx, baudrate=9600, timeout=3)
-        self.gps_dev = TimeSettingGPS(uart, debug=debug)
+    def __init__(self, debug=False, reset=False, tx=board.TX, rx=board.RX, builtin_parser=False,
+                 refresh_interval=3600, uart=None, rtc_clock=None, telemetry_size=32,
+                 max_refresh_interval=86400, error_budget=10, power_mode=None, force_on=None):
+        # uart and rtc_clock default to the real hardware, see sim/ for
+        # stand-ins
+        if uart is None:
+            uart = busio.UART(tx, rx, baudrate=9600, timeout=3)
+        if builtin_parser or adafruit_gps is None:
+            self.gps_dev = TimeSettingRMC(uart, debug=debug, rtc_clock=rtc_clock)
+        else:
+            self.gps_dev = TimeSettingGPS(uart, debug=debug, rtc_clock=rtc_clock)
 
         if reset:
             self.gps_dev.send_command(bytes('PMTK10{reset}', 'ascii'))
@@ -38,15 +451,43 @@ class GPS:
         # get/process RMC messages.
         #
         self.gps_dev.send_command(bytes('PMTK314,0,1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0', 'ascii'))
-        self.gps_dev.send_command(bytes('PMTK220,1000', 'ascii'))
+        self.gps_dev.send_command(bytes(f'PMTK220,{RMC_PERIOD_MS}', 'ascii'))
+
+        # Once we have a fix we only go back to the GPS to update the
+        # RTC; how often (in seconds, between refresh_interval and
+        # max_refresh_interval) depends on how fast it drifts and how
+        # far (error_budget seconds) we let it. See drift.py.
+        self.refresh_interval = refresh_interval
+        self.drift = drift.DriftModel(error_budget, refresh_interval,
+                                      max(refresh_interval, max_refresh_interval))
 
         self.last_read = -1 # in the time.monotonic_ns() timebase
         self.update_count = 0
 
-    def update_fix(self, now):
-        print("has_fix:", self.gps_dev.has_fix)
+        self.last_sentence = -1 # when the last one started, monotonic_ns()
+        self.arriving = False   # bytes were waiting at the last poll
+        self.backoff = POLL_MIN
+
+        # wake-ups (polls) it took to get each fix
+        self.fixes = 0
+        self.fix_wakeups = 0
+        self.last_fix_wakeups = 0
+
+        self.attempt_start = -1 # first poll of the current fix attempt
+        self.telemetry = FixTelemetry(telemetry_size)
 
+        # None, POWER_STANDBY or POWER_BACKUP (which needs force_on, a
+        # digitalio output wired to the module's FORCE_ON)
+        if power_mode == POWER_BACKUP and force_on is None:
+            raise ValueError("backup power mode needs a force_on pin")
+        self.power_mode = power_mode
+        self.force_on = force_on
+        self.woken_at = -1      # when we last woke the module
+        self.start_estimate = None # seconds, typical start after a wake
+        self.hot_starts = 0
+        self.warm_starts = 0
 
+    def update_fix(self, now):
         # make a bunch of checks to see if we really have a complete fix
         #
         if not self.gps_dev.has_fix:
@@ -78,32 +519,150 @@ class GPS:
         self.last_read = now
 
     def has_fix(self):
-        print("last_read", self.last_read)
         return self.last_read >= 0
 
     def start(self, now):
-        return self.poll, statemachines.OneShot(now, 0)
+        return self.poll, triggers.OneShot(now, 0)
+
+    def poll_delay(self, now):
+        """ns until the next poll while waiting for a fix, see the
+        polling policy above.
+        """
+        if self.arriving:
+            # A sentence is arriving, keep reading it before the
+            # UART's buffer overflows
+            self.backoff = POLL_MIN
+            return POLL_ARRIVING
+
+        if self.last_sentence >= 0:
+            due = self.last_sentence + RMC_PERIOD
+            if due - WAKE_LEAD > now:
+                return due - WAKE_LEAD - now
+            if now < due + WAKE_LEAD:
+                return POLL_ARRIVING
+
+        # No signal, or the sentence is late
+        delay = self.backoff
+        self.backoff = min(2 * delay, POLL_MAX)
+        return delay
+
+    def wakeups_per_fix(self):
+        "Mean polls it has taken to get a fix"
+        if self.fixes == 0:
+            return 0
+        return self.fix_wakeups / self.fixes
 
     def poll(self, now):
+        if self.update_count == 0:
+            # Start of a fix attempt. Whatever is in the UART's buffer
+            # was received just after the last one, don't take its
+            # (stale) time.
+            self.attempt_start = now
+            self.gps_dev.reset_input()
+            self.gps_dev.rtc_correction = None
+
+        waiting = self.gps_dev.in_waiting
+        tracer.debug(tracer.GPS_POLL, waiting)
+        if waiting and not self.arriving:
+            # First sight of a sentence, when did it start?
+            self.last_sentence = now - waiting * BYTE_TIME
+        self.arriving = waiting > 0
+
         last_last_read = self.last_read
         if self.gps_dev.update():
-            print(f"calling update_fix @ {now}")
+            self.backoff = POLL_MIN
             self.update_fix(now)
 
         self.update_count += 1
 
         if self.last_read < 0 or last_last_read == self.last_read:
             # Didn't read anything, or if we did the fix isn't yet
-            # complete. Emperically it seems if we want to actualy get
-            # a reading from the GPS we have loop pretty tightly
-            # calling update until we get something.
-            return None, statemachines.OneShot(now, int(0.1 * statemachines.SECONDS_PER_NS))
+            # complete.
+            return None, triggers.OneShot(now, self.poll_delay(now))
 
         # Else assume we don't move and we're just worried about clock
-        # drift, so just go to the GPS once an hour *primarly* to update the RTC.
-        print(self.update_count, "calls to get new GPS reading")
+        # drift, so only go back to the GPS when the RTC may have
+        # drifted error_budget seconds.
+        if self.gps_dev.rtc_correction is not None:
+            self.drift.sync(now, self.gps_dev.rtc_correction, self.attempt_start)
+
+        self.fixes += 1
+        self.fix_wakeups += self.update_count
+        self.last_fix_wakeups = self.update_count
+        tracer.info(tracer.GPS_FIX, self.update_count)
+
+        gps_dev = self.gps_dev
+        self.telemetry.record((now - self.attempt_start) // 1000000,
+                              self.update_count,
+                              -1 if gps_dev.satellites is None else gps_dev.satellites,
+                              gps_dev.fix_quality or 0,
+                              gps_dev.rtc_correction or 0)
+
         self.update_count = 0
-        return None, statemachines.OneShot(now, 3600 * statemachines.SECONDS_PER_NS)
+        self.last_sentence = -1
+        self.arriving = False
+
+        if self.woken_at >= 0:
+            self._started(now - self.woken_at)
+            self.woken_at = -1
+
+        interval = self.drift.next_interval()
+        if self.power_mode is None:
+            return None, triggers.OneShot(now, interval * statemachines.SECONDS_PER_NS)
+
+        self.power_down()
+        sleep = max(interval - self.wake_lead(), 0)
+        tracer.info(tracer.GPS_SLEEP, int(sleep))
+        return self.asleep, triggers.OneShot(now, int(sleep * statemachines.SECONDS_PER_NS))
+
+    def wake_lead(self):
+        "Seconds before a sync is due to wake the module"
+        if self.start_estimate is None:
+            return MAX_WAKE_LEAD
+        return min(max(WAKE_LEAD_FACTOR * self.start_estimate, MIN_WAKE_LEAD), MAX_WAKE_LEAD)
+
+    def _started(self, ns):
+        # The module took ns from being woken to a fix
+        seconds = ns / statemachines.SECONDS_PER_NS
+        if seconds <= HOT_START:
+            self.hot_starts += 1
+        else:
+            self.warm_starts += 1
+
+        if self.start_estimate is None:
+            self.start_estimate = seconds
+        else:
+            self.start_estimate += (seconds - self.start_estimate) / 4
+
+    def power_down(self):
+        if self.power_mode == POWER_BACKUP:
+            self.force_on.value = False
+            self.gps_dev.send_command(BACKUP_COMMAND)
+        else:
+            self.gps_dev.send_command(STANDBY_COMMAND)
+
+    def wake(self, now):
+        if self.power_mode == POWER_BACKUP:
+            self.force_on.value = True
+            tracer.info(tracer.GPS_WAKE, 2)
+        else:
+            self.gps_dev.send_command(WAKE_COMMAND)
+            tracer.info(tracer.GPS_WAKE, 1)
+        self.woken_at = now
+
+    def asleep(self, now):
+        # The module is powered down, time to wake it for the next sync
+        self.wake(now)
+        return self.poll, triggers.OneShot(now, 0)
+
+    def dump(self):
+        "Print the fix telemetry, for Debug"
+        print(f"{self}: {self.wakeups_per_fix():.1f} polls/fix, {self.drift}")
+        if self.power_mode is not None:
+            print(f" {self.power_mode}: {self.hot_starts} hot/{self.warm_starts} warm starts, wake lead {self.wake_lead():.0f}s")
+        if isinstance(self.gps_dev, RMCReceiver):
+            print(f" {self.gps_dev}")
+        self.telemetry.dump()
 
     def __str__(self):
         return f"{self.__class__.__name__}:{self.last_read}"
@@ -0,0 +1,126 @@
+# What we last knew about where we are, kept across resets in
+# microcontroller.nvm (or anything else that slices like a bytearray),
+# so Control can go straight to automatic mode at boot instead of
+# waiting minutes (or forever, indoors) for a GPS fix.
+#
+# The record is the last fix's latitude and longitude, when it was (by
+# the RTC), and the next couple of transitions that were computed for
+# it, packed little endian with a Fletcher-16 checksum:
+#
+#   magic  "CL"     version  B      count  B (transitions held)
+#   darks  B (bit n set if it's dark after transition n)     pad  x
+#   latitude  f     longitude  f    fixed  l
+#   transitions  TRANSITIONS * l    checksum  H
+#
+# Times are seconds since 2000-01-01 of the RTC's (UTC) clock, which
+# fits in 31 bits until 2068.
+
+import struct
+
+import astral
+
+MAGIC = b"CL"
+VERSION = 1
+TRANSITIONS = 2
+FORMAT = "<2sBBBxffl%dl" % TRANSITIONS
+BODY_SIZE = struct.calcsize(FORMAT)
+SIZE = BODY_SIZE + 2
+
+EPOCH = astral.DateSeconds(astral.Date(2000, 1, 1), 0)
+
+def to_seconds(t):
+    "DateSeconds t -> seconds since EPOCH"
+    return t - EPOCH
+
+def from_seconds(seconds):
+    "Seconds since EPOCH -> DateSeconds"
+    return EPOCH + seconds
+
+def _fletcher16(data):
+    low = high = 0
+    for c in data:
+        low = (low + c) % 255
+        high = (high + low) % 255
+    return high << 8 | low
+
+class Saved:
+    """A fix and the transitions after it. transitions is a list of
+    (DateSeconds, dark after it), in time order.
+    """
+
+    def __init__(self, latitude, longitude, fixed, transitions=()):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.fixed = fixed
+        self.transitions = list(transitions)[:TRANSITIONS]
+
+    def darkness_at(self, t):
+        """(dark, next change) at DateSeconds t from the transitions, like
+        solarcache.SolarCache.darkness_at, or None if they don't cover t
+        """
+        if t < self.fixed:
+            return None
+        dark = None
+        for change, dark_after in self.transitions:
+            if change > t:
+                if dark is None:
+                    dark = not dark_after
+                return dark, change
+            dark = dark_after
+        return None
+
+    def pack(self):
+        darks = 0
+        seconds = [0] * TRANSITIONS
+        for n, (change, dark) in enumerate(self.transitions):
+            seconds[n] = to_seconds(change)
+            if dark:
+                darks |= 1 << n
+        body = struct.pack(FORMAT, MAGIC, VERSION, len(self.transitions), darks,
+                           self.latitude, self.longitude, to_seconds(self.fixed), *seconds)
+        return body + struct.pack("<H", _fletcher16(body))
+
+    @classmethod
+    def unpack(cls, data):
+        "The Saved packed in data, or None if it isn't a valid record"
+        if len(data) < SIZE:
+            return None
+        body = bytes(data[:BODY_SIZE])
+        (checksum,) = struct.unpack("<H", data[BODY_SIZE:SIZE])
+        if checksum != _fletcher16(body):
+            return None
+        fields = struct.unpack(FORMAT, body)
+        magic, version, count, darks, latitude, longitude, fixed = fields[:7]
+        if magic != MAGIC or version != VERSION or count > TRANSITIONS:
+            return None
+        transitions = [(from_seconds(fields[7 + n]), bool(darks >> n & 1)) for n in range(count)]
+        return cls(latitude, longitude, from_seconds(fixed), transitions)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}:({self.latitude:.4f}, {self.longitude:.4f}) fixed {self.fixed}"
+
+class Store:
+    "Saved records at offset in nvm"
+
+    def __init__(self, nvm, offset=0):
+        self.nvm = nvm
+        self.offset = offset
+        self.writes = 0
+
+    def load(self):
+        "The Saved record, or None if there isn't a valid one"
+        return Saved.unpack(self.nvm[self.offset:self.offset + SIZE])
+
+    def save(self, saved):
+        """Write saved, unless it's what is there already (flash wears
+        out). Returns True if it was written.
+        """
+        data = saved.pack()
+        if self.nvm[self.offset:self.offset + SIZE] == data:
+            return False
+        self.nvm[self.offset:self.offset + SIZE] = data
+        self.writes += 1
+        return True
+
+    def __str__(self):
+        return f"{self.__class__.__name__}:{self.writes} writes"
@@ -0,0 +1,260 @@
+# Precomputed sunrise/sunset (and optionally dawn/dusk) times for one
+# location, stored in a compact binary file so the board can look up
+# the next transition with a single indexed read instead of running
+# the trig in astral.
+#
+# File layout (little endian):
+#
+#   header:  magic b'SKED', version (B), number of event kinds (B),
+#            2 pad bytes, latitude (d), longitude (d), first day
+#            ordinal (I), number of days (I), dawn/dusk depression (d),
+#            event kind codes (4s, unused slots 0xff)
+#   records: one per day, a uint32 per event kind, seconds since
+#            midnight UTC of the day *before* the first day (an event
+#            can fall on the previous UTC date), or NEVER if the event
+#            doesn't happen on that day.
+#
+# Build a file on the host with
+#
+#   python schedule.py build schedule.bin LATITUDE LONGITUDE YEAR YEARS [--twilight]
+#
+# and copy it to the board next to code.py.
+
+import struct
+
+import astral
+
+MAGIC = b'SKED'
+VERSION = 1
+NEVER = 0xffffffff
+
+_HEADER = '<4sBBxxddIId4s'
+_HEADER_SIZE = struct.calcsize(_HEADER)
+
+_KINDS = (astral.SUNRISE, astral.SUNSET, astral.DAWN, astral.DUSK)
+
+class ScheduleError(Exception):
+    pass
+
+class Schedule:
+    def __init__(self, f):
+        self._f = f
+        self._map = None
+
+        header = f.read(_HEADER_SIZE)
+        if len(header) != _HEADER_SIZE:
+            raise ScheduleError("truncated header")
+
+        (magic, version, count, self.latitude, self.longitude,
+         self.start, self.days, self.depression, codes) = struct.unpack(_HEADER, header)
+        if magic != MAGIC or version != VERSION:
+            raise ScheduleError("not a version %d schedule file" % VERSION)
+
+        self.kinds = tuple(_KINDS[code] for code in codes[:count])
+        self._record = '<%dI' % count
+        self._record_size = 4 * count
+        self._base = astral.Date.fromordinal(self.start - 1)
+
+        # The events of the day before the first day aren't in the file,
+        # and can fall on the first day: a date's events are at most
+        # 720 + 4 * (180 - longitude) minutes, less the equation of time
+        # (at least -14.4 minutes), after its midnight UTC. Until the
+        # last of them could have passed next_after() can't say what's
+        # next.
+        self._covered = self._time(astral.SECS_PER_DAY + max(0, int(-240 * self.longitude) + 1200))
+
+        try:
+            import mmap
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ImportError, AttributeError, OSError):
+            # No mmap (e.g. CircuitPython), seek and read each record
+            self._buf = bytearray(self._record_size)
+
+    @classmethod
+    def open(cls, path):
+        return cls(open(path, 'rb'))
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._f.close()
+
+    def near(self, latitude, longitude, tolerance=0.1):
+        """True if the schedule was computed for a location within
+        tolerance degrees of latitude/longitude. 0.1 degrees moves the
+        events by well under a minute.
+        """
+        return (abs(self.latitude - latitude) <= tolerance and
+                abs(self.longitude - longitude) <= tolerance)
+
+    def _values(self, ordinal):
+        # Raw record for the day, or None if outside the file
+        i = ordinal - self.start
+        if i < 0 or i >= self.days:
+            return None
+
+        offset = _HEADER_SIZE + i * self._record_size
+        if self._map is not None:
+            return struct.unpack_from(self._record, self._map, offset)
+
+        self._f.seek(offset)
+        self._f.readinto(self._buf)
+        return struct.unpack_from(self._record, self._buf)
+
+    def _time(self, value):
+        return astral.DateSeconds(self._base, value)
+
+    def events_on(self, ordinal):
+        """Return a tuple with the time (DateSeconds) of each of
+        self.kinds on the day with the given ordinal, None where the
+        event doesn't happen that day. Returns None if the day isn't in
+        the schedule.
+        """
+        values = self._values(ordinal)
+        if values is None:
+            return None
+        return tuple(None if value == NEVER else self._time(value) for value in values)
+
+    def next_after(self, t, events=None, max_days=366):
+        """Like astral.next_transition: return (event_time, event) for
+        the first of events (default all the kinds in the file) strictly
+        after t, or None if the schedule doesn't cover it.
+        """
+        if events is None:
+            events = self.kinds
+        wanted = tuple(kind in events for kind in self.kinds)
+
+        # See astral.next_transition for why the search starts the day
+        # before t and can stop at the first day with a later event.
+        # On the first day the day before isn't in the file, so the
+        # search starts at the first day, once that can't miss anything.
+        ordinal = t.date.toordinal() - 1
+        if ordinal < self.start:
+            if t < self._covered:
+                return None
+            ordinal = self.start
+
+        after = t - astral.DateSeconds(self._base, 0)
+        for _ in range(max_days + 1):
+            values = self._values(ordinal)
+            if values is None:
+                return None
+
+            best = None
+            for i, value in enumerate(values):
+                if wanted[i] and value != NEVER and value > after:
+                    if best is None or value < values[best]:
+                        best = i
+
+            if best is not None:
+                return self._time(values[best]), self.kinds[best]
+
+            ordinal += 1
+
+        return None
+
+def pack_header(latitude, longitude, start_ordinal, days, kinds, depression='civil'):
+    """The header of a schedule file, for writers that produce the
+    records themselves (see fleet.py)
+    """
+    codes = bytes(_KINDS.index(kind) for kind in kinds) + b'\xff' * (4 - len(kinds))
+    return struct.pack(_HEADER, MAGIC, VERSION, len(kinds), latitude, longitude,
+                       start_ordinal, days, astral._depression(depression), codes)
+
+def build(path, latitude, longitude, start, days,
+          kinds=(astral.SUNRISE, astral.SUNSET), depression='civil'):
+    """Write a schedule for days days starting at Date start to path"""
+    calcs = astral._event_calcs(kinds, depression)
+    base = astral.DateSeconds(start.yesterday(), 0)
+
+    with open(path, 'wb') as f:
+        f.write(pack_header(latitude, longitude, start.toordinal(), days, kinds, depression))
+
+        record = '<%dI' % len(kinds)
+        date = start
+        for _ in range(days):
+            values = []
+            for _, event_depression, direction in calcs:
+                try:
+                    t = astral._calc_time(event_depression, direction, date, latitude, longitude)
+                    values.append(t - base)
+                except ValueError:
+                    # Event doesn't happen on this day at this location
+                    values.append(NEVER)
+            f.write(struct.pack(record, *values))
+            date = date.tomarrow()
+
+def check(path):
+    """Compare the schedule in path against astral, return a list of
+    (ordinal, event, stored, computed) for every day/event that
+    differs, and ("next_after", ...) if next_after from the start of
+    the first day doesn't give that day's first event.
+    """
+    schedule = Schedule.open(path)
+    try:
+        calcs = astral._event_calcs(schedule.kinds, schedule.depression)
+        mismatches = []
+        for ordinal in range(schedule.start, schedule.start + schedule.days):
+            date = astral.Date.fromordinal(ordinal)
+            for stored, (event, depression, direction) in zip(schedule.events_on(ordinal), calcs):
+                try:
+                    computed = astral._calc_time(depression, direction, date,
+                                                 schedule.latitude, schedule.longitude)
+                except ValueError:
+                    computed = None
+                if stored is None or computed is None:
+                    differs = stored is not computed
+                else:
+                    differs = stored != computed
+                if differs:
+                    mismatches.append((ordinal, event, stored, computed))
+
+        # Around the start of the file next_after has to agree with
+        # astral, or say it doesn't know (None) before it can, from
+        # midnight of the day before the first day, midnight of the first
+        # day, when it can and just before the first day's first event
+        probes = [schedule._time(0), schedule._time(astral.SECS_PER_DAY), schedule._covered]
+        events = [t for t in schedule.events_on(schedule.start) if t is not None]
+        if events:
+            probes.append(min(events) - 1)
+        for t in probes:
+            stored = schedule.next_after(t)
+            computed = astral.next_transition(t, schedule.latitude, schedule.longitude,
+                                              schedule.kinds, schedule.depression)
+            if stored is None and t < schedule._covered:
+                continue
+            if stored != computed:
+                mismatches.append((schedule.start, "next_after %s" % t, stored, computed))
+        return mismatches
+    finally:
+        schedule.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or check a precomputed schedule file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build")
+    build_parser.add_argument("path")
+    build_parser.add_argument("latitude", type=float)
+    build_parser.add_argument("longitude", type=float)
+    build_parser.add_argument("year", type=int)
+    build_parser.add_argument("years", type=int)
+    build_parser.add_argument("--twilight", action="store_true",
+                              help="include (civil) dawn and dusk")
+
+    check_parser = commands.add_parser("check")
+    check_parser.add_argument("path")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        start = astral.Date(args.year, 1, 1)
+        days = astral.Date(args.year + args.years, 1, 1) - start
+        kinds = _KINDS if args.twilight else _KINDS[:2]
+        build(args.path, args.latitude, args.longitude, start, days, kinds)
+    else:
+        mismatches = check(args.path)
+        for mismatch in mismatches:
+            print("%d %s: stored %s, computed %s" % mismatch)
+        raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,20 @@
+# Host side stand-ins for running the device code off the board.
+#
+#   clock     virtual (faster than real time) and real monotonic clocks,
+#             and an RTC stand-in driven by one
+#   nmea      the timestamped NMEA capture format, a recorder and a
+#             synthetic log generator
+#   uart      busio.UART stand-ins that replay a capture, or make up a
+#             receiver's sentences as they are due
+#   hardware  stand-in board/busio/rtc/digitalio/pwmio/statemachines/
+#             flicker modules, installed into sys.modules before
+#             importing the device code, and the board's time module
+#   machines  the statemachines stand-in, with a discrete event
+#             executive
+#   flicker   the flicker stand-in
+#   gpsbench  time-to-first-fix, polls per fix and parse throughput for
+#             gps.py over captured or synthetic logs
+#   system    all of code.py over days or a year of simulated time
+#   tracedump decodes tracer.py's dumps from a console log
+#
+# None of this is copied to the board.
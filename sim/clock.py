@@ -0,0 +1,83 @@
+# Clocks for the simulator. Anything that needs the time takes one of
+# these, so the same code can run in real time or as fast as the host
+# allows.
+
+import calendar
+import time
+
+class VirtualClock:
+    "monotonic_ns() clock that only moves when told to"
+
+    def __init__(self, start_ns=0):
+        self._now = start_ns
+
+    def monotonic_ns(self):
+        return self._now
+
+    def monotonic(self):
+        return self._now / 1e9
+
+    def advance(self, ns):
+        if ns < 0:
+            raise ValueError("time can't go backwards")
+        self._now += ns
+
+    def advance_to(self, ns):
+        if ns > self._now:
+            self._now = ns
+
+    def sleep(self, seconds):
+        self.advance(int(seconds * 1e9))
+
+class RealClock:
+    """The host's clock, with the VirtualClock interface, running
+    speedup times faster than real time.
+    """
+
+    def __init__(self, speedup=1):
+        self.speedup = speedup
+        self._start = time.monotonic_ns()
+
+    def monotonic_ns(self):
+        return int((time.monotonic_ns() - self._start) * self.speedup)
+
+    def monotonic(self):
+        return self.monotonic_ns() / 1e9
+
+    def advance_to(self, ns):
+        delay = ns - self.monotonic_ns()
+        if delay > 0:
+            time.sleep(delay / self.speedup / 1e9)
+
+    def sleep(self, seconds):
+        time.sleep(seconds / self.speedup)
+
+class VirtualRTC:
+    """rtc.RTC stand-in. Keeps UTC (the board has no time zone) from
+    a clock, gaining drift_ppm parts per million on it, and records
+    every time it is set.
+    """
+
+    def __init__(self, clock, datetime=None, drift_ppm=0):
+        self.clock = clock
+        self.drift_ppm = drift_ppm
+        self.sets = [] # (monotonic_ns, old struct_time, new struct_time)
+        self._set(time.gmtime(0) if datetime is None else datetime)
+
+    def _set(self, datetime):
+        self._base = calendar.timegm(datetime)
+        self._base_ns = self.clock.monotonic_ns()
+
+    def time(self):
+        "Seconds since the epoch (the equivalent of time.time())"
+        elapsed = self.clock.monotonic_ns() - self._base_ns
+        return self._base + int(elapsed * (1 + self.drift_ppm * 1e-6)) // 1000000000
+
+    @property
+    def datetime(self):
+        return time.gmtime(self.time())
+
+    @datetime.setter
+    def datetime(self, datetime):
+        self.sets.append((self.clock.monotonic_ns(), self.datetime, datetime))
+        self._set(datetime)
@@ -0,0 +1,56 @@
+# Stand-in for the flicker library (installed with the statemachines
+# submodule), installed as sys.modules["flicker"] by sim.hardware. It
+# has the interface code.py uses: FlickerPolicy, and a Flicker state
+# machine that calls set_color() each tick and goes dark (waiting on
+# the trigger it returns) while suppress() returns one.
+
+import random
+
+from sim import machines as statemachines
+
+class FlickerPolicy:
+    def __init__(self, index_bottom, index_min, index_max):
+        self.index_bottom = index_bottom
+        self.index_min = index_min
+        self.index_max = index_max
+
+class Flicker:
+    # color is per channel multipliers of the level, in 256ths
+    def __init__(self, event, policy, color=(256, 96, 12)):
+        self.event = event
+        self.policy = policy
+        self.color = color
+        self.transitions = 0
+        self.state = self.start
+
+    def set_color(self, red, green, blue):
+        pass
+
+    def suppress(self):
+        return None
+
+    def _to(self, state):
+        self.transitions += 1
+        self.state = state
+        return state, statemachines.IMMEDATE_TRANSFER
+
+    def start(self, now):
+        return self._to(self.flicker)
+
+    def dark(self, now):
+        if self.suppress() is None:
+            return self._to(self.flicker)
+        return None, self.suppress()
+
+    def flicker(self, now):
+        trigger = self.suppress()
+        if trigger is not None:
+            self.set_color(0, 0, 0)
+            self._to(self.dark)
+            return self.dark, trigger
+
+        policy = self.policy
+        level = random.randint(policy.index_min, policy.index_max)
+        red, green, blue = self.color
+        self.set_color(level * red >> 8, level * green >> 8, level * blue >> 8)
+        return None, self.event
@@ -0,0 +1,189 @@
+# Benchmarks gps.py against NMEA captures (see sim.nmea):
+#
+#   python -m sim.gpsbench [capture ...] [--backend builtin|adafruit|all]
+#                          [--refresh SECONDS] [--max-refresh SECONDS]
+#                          [--rtc-drift PPM] [--power standby|backup]
+#                          [--realtime SPEEDUP] [--json FILE]
+#
+# With no captures it uses a synthetic one (--hours long, six by
+# default) with fix outages and corrupt sentences. For each capture and
+# parser backend it reports
+#
+#  * time to first fix and the polls each fix took, running GPS.poll
+#    against a ReplayUART on a virtual clock (or, with --realtime, on
+#    the real clock sped up SPEEDUP times)
+#  * with --power, the GPS duty-cycles the module; the UART is a
+#    ScriptedUART that powers down and starts up like the real thing
+#    and checks the commands sent to it. Reports the hot/warm starts,
+#    the wake lead and how much of the time the module was on, and
+#    fails if the commands were wrong.
+#  * parse throughput: the whole capture fed to the parser at once, in
+#    bytes and sentences per second of host CPU time
+
+import argparse
+import calendar
+import contextlib
+import json
+import os
+import sys
+import time
+
+from sim import nmea
+from sim.clock import RealClock, VirtualClock, VirtualRTC
+from sim.hardware import install
+from sim.uart import ReplayUART, ScriptedUART
+
+def _backends(choice):
+    import gps
+    available = ["builtin"] + (["adafruit"] if gps.adafruit_gps is not None else [])
+    if choice == "all":
+        return available
+    if choice not in available:
+        raise SystemExit("%s parser not available" % choice)
+    return [choice]
+
+def power_script(power, cycles=10000):
+    "The commands GPS(power_mode=power) should send"
+    script = [nmea.sentence(b"PMTK314,0,1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0"),
+              nmea.sentence(b"PMTK220,1000")]
+    if power == "backup":
+        return script + [nmea.sentence(b"PMTK225,4")] * cycles
+    return script + [nmea.sentence(b"PMTK161,0"), nmea.sentence(b"PMTK000")] * cycles
+
+def polling(events, backend, refresh, max_refresh, rtc_drift=0, power=None, speedup=None):
+    "Run GPS.poll over the capture, returning the fixes it got"
+    import gps
+    import statemachines
+
+    clock = VirtualClock() if speedup is None else RealClock(speedup)
+    if power is None:
+        uart = ReplayUART(events, clock)
+    else:
+        uart = ScriptedUART(events, clock, power_script(power))
+    rtc_clock = VirtualRTC(clock, drift_ppm=rtc_drift)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        machine = gps.GPS(builtin_parser=backend == "builtin", uart=uart, rtc_clock=rtc_clock,
+                          refresh_interval=refresh, max_refresh_interval=max_refresh,
+                          power_mode=power, force_on=getattr(uart, "force_on", None))
+        start = clock.monotonic_ns()
+        end = start + events[-1][0] + 10 * statemachines.SECONDS_PER_NS
+
+        fixes = []
+        polls = 0
+        state, trigger = machine.start(start)
+        while True:
+            if trigger is not statemachines.IMMEDATE_TRANSFER:
+                deadline = trigger.next_deadline(clock.monotonic_ns())
+                if deadline > end:
+                    break
+                clock.advance_to(deadline)
+            now = clock.monotonic_ns()
+            next_state, trigger = state(now)
+            if next_state is not None:
+                state = next_state
+            polls += 1
+            if machine.fixes > len(fixes):
+                fixes.append(((now - start) / 1e9, machine.last_fix_wakeups))
+
+    result = {
+        "polls": polls,
+        "fixes": len(fixes),
+        "time_to_first_fix": fixes[0][0] if fixes else None,
+        "polls_per_fix": [wakeups for _, wakeups in fixes],
+        "rtc_sets": len(rtc_clock.sets),
+        "bytes_dropped": uart.dropped,
+        "drift_ppm": machine.drift.rate * 1e6,
+        "refresh_interval": machine.drift.interval,
+        "telemetry": {field: machine.telemetry.summary(field) for field in machine.telemetry.FIELDS},
+    }
+    if power is not None:
+        result["power"] = {
+            "errors": uart.errors,
+            "commands": len(uart.commands),
+            "on_fraction": uart.on_fraction(),
+            "hot_starts": machine.hot_starts,
+            "warm_starts": machine.warm_starts,
+            "wake_lead": machine.wake_lead(),
+        }
+    return result
+
+def throughput(events, backend):
+    "Parse the whole capture as fast as possible"
+    import gps
+
+    uart = ReplayUART(events, VirtualClock(), speedup=None)
+    if backend == "builtin":
+        receiver = gps.RMCReceiver(uart)
+    else:
+        receiver = gps.adafruit_gps.GPS(uart)
+
+    t0 = time.perf_counter()
+    while not uart.finished():
+        receiver.update()
+    elapsed = time.perf_counter() - t0
+
+    size = sum(len(data) for _, data in events)
+    return {"bytes_per_sec": size / elapsed, "sentences_per_sec": len(events) / elapsed}
+
+def main():
+    parser = argparse.ArgumentParser(description="gps.py replay benchmarks")
+    parser.add_argument("captures", nargs="*")
+    parser.add_argument("--backend", default="all", choices=("builtin", "adafruit", "all"))
+    parser.add_argument("--refresh", type=int, default=3600, help="GPS refresh_interval")
+    parser.add_argument("--max-refresh", type=int, default=86400, help="GPS max_refresh_interval")
+    parser.add_argument("--rtc-drift", type=float, default=0, help="RTC drift, ppm (fast if positive)")
+    parser.add_argument("--hours", type=float, default=6, help="length of the synthetic capture")
+    parser.add_argument("--power", choices=("standby", "backup"), help="GPS power_mode")
+    parser.add_argument("--realtime", type=float, metavar="SPEEDUP",
+                        help="poll on the real clock, with the capture sped up")
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args()
+
+    install(VirtualClock())
+
+    if args.captures:
+        captures = [(path, nmea.load(path)) for path in args.captures]
+    else:
+        start = calendar.timegm((2024, 6, 1, 12, 0, 0))
+        captures = [("synthetic", nmea.synthesize(start, int(args.hours * 3600), 40.0, -75.0,
+                                                  outage_every=5000, outage=600,
+                                                  corrupt_every=97))]
+
+    results = []
+    for name, events in captures:
+        for backend in _backends(args.backend):
+            result = dict(capture=name, backend=backend, sentences=len(events))
+            result.update(polling(events, backend, args.refresh, args.max_refresh,
+                                  args.rtc_drift, args.power, args.realtime))
+            result.update(throughput(events, backend))
+            results.append(result)
+
+            polls_per_fix = result["polls_per_fix"]
+            print("%s [%s]: %d sentences, first fix %s, %d fixes, polls/fix %s, "
+                  "%d RTC sets, %d bytes dropped, drift %.1f ppm, refresh %d s, "
+                  "%.0f bytes/s %.0f sentences/s"
+                  % (name, backend, len(events),
+                     "%.1f s" % result["time_to_first_fix"] if polls_per_fix else "never",
+                     result["fixes"],
+                     "%.1f (max %d)" % (sum(polls_per_fix) / len(polls_per_fix), max(polls_per_fix))
+                     if polls_per_fix else "-",
+                     result["rtc_sets"], result["bytes_dropped"],
+                     result["drift_ppm"], result["refresh_interval"],
+                     result["bytes_per_sec"], result["sentences_per_sec"]))
+
+            power = result.get("power")
+            if power:
+                print("  %s: on %.1f%% of the time, %d hot/%d warm starts, wake lead %.0f s, %d commands"
+                      % (args.power, 100 * power["on_fraction"], power["hot_starts"],
+                         power["warm_starts"], power["wake_lead"], power["commands"]))
+                for error in power["errors"]:
+                    print("  FAIL:", error)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+    return 1 if any(result.get("power", {}).get("errors") for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# Stand-ins for the CircuitPython hardware modules the device code
+# imports. install() puts them in sys.modules, so call it before
+# importing gps.py etc:
+#
+#   clock = sim.clock.VirtualClock()
+#   hardware = sim.hardware.install(clock)
+#   import gps
+#
+# busio.UART() hands out the UARTs in hardware.uarts (see
+# sim.uart.ReplayUART), in order, rtc.RTC() is hardware.rtc and
+# microcontroller.nvm is hardware.nvm, and supervisor.ticks_ms() is
+# the clock's milliseconds, wrapping like the board's.
+# digitalio.DigitalInOut(pin) reads hardware.inputs[pin name] (a
+# function of the clock's monotonic_ns()) if there is one, and pwmio
+# outputs are kept in hardware.pwm by pin name.
+#
+# The board's time module (monotonic from the clock, the wall time
+# from the RTC, no time zone) can't replace the host's for everything,
+# so load() swaps it in just while importing a device module.
+
+import calendar
+import importlib.util
+import sys
+import time
+import types
+
+from sim import flicker
+from sim import machines
+from sim.clock import VirtualRTC
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "board." + self.name
+
+# supervisor.ticks_ms() wraps at this
+TICKS_PERIOD = 1 << 29
+
+PINS = ("TX", "RX", "SCL", "SDA", "A0", "A1", "A2", "A3", "A4", "A5",
+        "D5", "D6", "D9", "D10", "D11", "D12", "D13")
+
+class DigitalInOut:
+    # digitalio.DigitalInOut; reads source(monotonic_ns) if it has one
+    def __init__(self, pin, clock, source=None):
+        self.pin = pin
+        self.clock = clock
+        self.source = source
+        self.direction = None
+        self.pull = None
+        self._value = False
+
+    def switch_to_input(self, pull=None):
+        self.direction = "input"
+        self.pull = pull
+
+    def switch_to_output(self, value=False, **kwargs):
+        self.direction = "output"
+        self._value = value
+
+    @property
+    def value(self):
+        if self.source is not None:
+            return self.source(self.clock.monotonic_ns())
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+
+class PWMOut:
+    # pwmio.PWMOut, counting the duty cycle writes
+    def __init__(self, pin, frequency=500, duty_cycle=0, **kwargs):
+        self.pin = pin
+        self.frequency = frequency
+        self._duty_cycle = duty_cycle
+        self.writes = 0
+
+    @property
+    def duty_cycle(self):
+        return self._duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        if not 0 <= value <= 65535:
+            raise ValueError("duty_cycle must be 0-65535, not %r" % value)
+        self._duty_cycle = value
+        self.writes += 1
+
+class NVM(bytearray):
+    """microcontroller.nvm: a bytearray (erased to 0xff) that counts the
+    writes made to it, and can be loaded from and saved to a file to
+    carry it across simulated resets.
+    """
+
+    def __init__(self, size=8192):
+        bytearray.__init__(self, b"\xff" * size)
+        self.writes = 0
+
+    def __setitem__(self, index, value):
+        bytearray.__setitem__(self, index, value)
+        self.writes += 1
+
+    def load(self, path):
+        with open(path, "rb") as f:
+            data = f.read(len(self))
+        bytearray.__setitem__(self, slice(0, len(data)), data)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self)
+
+def _constants(name, *values):
+    return types.SimpleNamespace(**{value: name + "." + value for value in values})
+
+class Hardware:
+    def __init__(self, clock, rtc=None):
+        self.clock = clock
+        self.rtc = rtc if rtc is not None else VirtualRTC(clock)
+        self.nvm = NVM()
+        self.uarts = []
+        self.inputs = {}    # pin name -> function(monotonic_ns) -> value
+        self.pwm = {}       # pin name -> PWMOut
+
+    def _uart(self, tx, rx, baudrate=9600, timeout=1, **kwargs):
+        if not self.uarts:
+            raise RuntimeError("no stand-in UART for busio.UART(%r, %r)" % (tx, rx))
+        uart = self.uarts.pop(0)
+        uart.baudrate = baudrate
+        return uart
+
+    def _digital_in_out(self, pin):
+        return DigitalInOut(pin, self.clock, self.inputs.get(pin.name))
+
+    def _pwm_out(self, pin, **kwargs):
+        pwm = PWMOut(pin, **kwargs)
+        self.pwm[pin.name] = pwm
+        return pwm
+
+    def time_module(self):
+        "The board's time module"
+        device_time = types.ModuleType("time")
+        device_time.struct_time = time.struct_time
+        device_time.monotonic_ns = self.clock.monotonic_ns
+        device_time.monotonic = self.clock.monotonic
+        device_time.sleep = self.clock.sleep
+        device_time.time = self.rtc.time
+        device_time.localtime = lambda t=None: time.gmtime(self.rtc.time() if t is None else t)
+        device_time.mktime = lambda t: calendar.timegm(tuple(t))
+        return device_time
+
+    def load(self, path, name):
+        "Import the device module at path as name, with the board's time module"
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        host_time = sys.modules["time"]
+        sys.modules["time"] = self.time_module()
+        try:
+            sys.modules[name] = module
+            spec.loader.exec_module(module)
+        finally:
+            sys.modules["time"] = host_time
+        return module
+
+    def modules(self):
+        board = types.ModuleType("board")
+        for name in PINS:
+            setattr(board, name, Pin(name))
+
+        busio = types.ModuleType("busio")
+        busio.UART = self._uart
+
+        rtc = types.ModuleType("rtc")
+        rtc.RTC = lambda: self.rtc
+
+        digitalio = types.ModuleType("digitalio")
+        digitalio.DigitalInOut = self._digital_in_out
+        digitalio.Direction = _constants("Direction", "INPUT", "OUTPUT")
+        digitalio.Pull = _constants("Pull", "UP", "DOWN")
+
+        pwmio = types.ModuleType("pwmio")
+        pwmio.PWMOut = self._pwm_out
+
+        microcontroller = types.ModuleType("microcontroller")
+        microcontroller.nvm = self.nvm
+
+        supervisor = types.ModuleType("supervisor")
+        supervisor.ticks_ms = lambda: self.clock.monotonic_ns() // 1000000 % TICKS_PERIOD
+
+        return {"board": board, "busio": busio, "rtc": rtc, "digitalio": digitalio,
+                "pwmio": pwmio, "microcontroller": microcontroller, "supervisor": supervisor,
+                "statemachines": machines, "flicker": flicker}
+
+def install(clock, rtc=None):
+    "Install stand-in hardware modules driven by clock, returns the Hardware"
+    hardware = Hardware(clock, rtc)
+    sys.modules.update(hardware.modules())
+    return hardware
@@ -0,0 +1,171 @@
+# Stand-in for the statemachines library (the statemachines submodule),
+# installed as sys.modules["statemachines"] by sim.hardware. It has the
+# parts of its interface the device code uses.
+#
+# run() is a discrete event version of the executive: nothing happens
+# between triggers, so it jumps a clock (see sim.clock) from one
+# deadline to the next and can get through a simulated year in
+# seconds. configure() it before code.py calls run(); it returns at
+# the end of the simulation, leaving the per-machine counts in
+# executive.
+
+import time
+
+SECONDS_PER_NS = 1000000000
+
+class _ImmediateTransfer:
+    def __repr__(self):
+        return "IMMEDATE_TRANSFER"
+
+# Move to the next state without waiting
+IMMEDATE_TRANSFER = _ImmediateTransfer()
+
+class OneShot:
+    "Trigger once, delay_ns after now"
+
+    def __init__(self, now, delay_ns):
+        self.deadline = now + delay_ns
+
+    def next_deadline(self, now):
+        return self.deadline
+
+class Pulser:
+    "Trigger every period seconds"
+
+    def __init__(self, period):
+        self.period_ns = int(period * SECONDS_PER_NS)
+
+    def next_deadline(self, now):
+        return now + self.period_ns
+
+# Counters the device code prints
+monotonic_ns_calls = 0
+
+def count_string():
+    return executive.count_string() if executive is not None else ""
+
+def unwrap(machine):
+    "The machine a stateprof.Profiler wrapper was registered for"
+    return getattr(machine, "machine", machine)
+
+class MachineStats:
+    "What one registered machine did"
+
+    def __init__(self, machine):
+        self.machine = unwrap(machine)
+        self.name = self.machine.__class__.__name__
+        self.dispatches = 0     # state function calls made
+        self.ticks = 0          # calls the board would have made (see min_period)
+        self.cpu = 0.0          # host seconds in its state functions, scaled likewise
+
+class Executive:
+    """Runs the registered machines on clock until end_ns.
+
+    Each machine starts with machine.start(now), and each state
+    function returns (next state or None, trigger). A trigger is
+    IMMEDATE_TRANSFER, has next_deadline(now) (OneShot, Pulser), or has
+    triggered() (a condition, like code.py's Control). Conditions only
+    change when a machine runs, so they are checked after each dispatch
+    and the clock only moves to the next deadline once nothing is
+    ready.
+
+    Pulsers faster than min_period seconds are run every min_period
+    instead, and each of those dispatches counts (in ticks and cpu) for
+    the ones it stands in for. after_dispatch(machine, state, now), if
+    set, is called after every dispatch.
+    """
+
+    def __init__(self, clock, end_ns, min_period=0, after_dispatch=None):
+        self.clock = clock
+        self.end_ns = end_ns
+        self.min_period_ns = int(min_period * SECONDS_PER_NS)
+        self.after_dispatch = after_dispatch
+        self.stats = []
+        self.wakeups = 0        # times the clock moved to a deadline (scaled)
+        self.callbacks = 0
+
+    def _arm(self, trigger, now):
+        # (deadline or None, weight) of a trigger
+        if trigger is IMMEDATE_TRANSFER:
+            return now, 1
+        if not hasattr(trigger, "next_deadline"):
+            return None, 1
+        deadline = trigger.next_deadline(now)
+        period = getattr(trigger, "period_ns", None)
+        if period is not None and 0 < period < self.min_period_ns:
+            return now + self.min_period_ns, self.min_period_ns / period
+        return deadline, 1
+
+    def run(self, machines, callbacks=()):
+        clock = self.clock
+        now = clock.monotonic_ns()
+        entries = []
+        for machine in machines:
+            stats = MachineStats(machine)
+            self.stats.append(stats)
+            entries.append([stats, machine.start, IMMEDATE_TRANSFER, now, 1])
+
+        while True:
+            ran = False
+            for entry in entries:
+                stats, state, trigger, deadline, weight = entry
+                now = clock.monotonic_ns()
+                if deadline is None:
+                    if not trigger.triggered():
+                        continue
+                elif deadline > now:
+                    continue
+
+                t0 = time.perf_counter()
+                next_state, trigger = state(now)
+                elapsed = time.perf_counter() - t0
+
+                if next_state is not None:
+                    entry[1] = next_state
+                entry[2] = trigger
+                entry[3], entry[4] = self._arm(trigger, now)
+                stats.dispatches += 1
+                stats.ticks += weight
+                stats.cpu += elapsed * weight
+                for callback in callbacks:
+                    callback()
+                self.callbacks += len(callbacks)
+                if self.after_dispatch is not None:
+                    self.after_dispatch(stats.machine, state, now)
+                ran = True
+
+            if ran:
+                continue
+
+            # Nothing ready, sleep until the next deadline
+            waiting = [entry for entry in entries if entry[3] is not None]
+            if not waiting:
+                break
+            entry = min(waiting, key=lambda entry: entry[3])
+            if entry[3] > self.end_ns:
+                break
+            clock.advance_to(entry[3])
+            self.wakeups += entry[4]
+
+        clock.advance_to(self.end_ns)
+
+    def count_string(self):
+        return " ".join("%s:%d" % (stats.name, stats.ticks) for stats in self.stats)
+
+executive = None
+_machines = []
+
+def configure(clock, end_ns, **kwargs):
+    "Set up the Executive the next run() uses, and forget registered machines"
+    global executive
+    executive = Executive(clock, end_ns, **kwargs)
+    del _machines[:]
+    return executive
+
+def register_machine(*machines):
+    _machines.extend(machines)
+
+def run(callbacks=(), dump_interval=None):
+    if executive is None:
+        raise RuntimeError("statemachines.run() needs sim.machines.configure() first")
+    executive.run(list(_machines), callbacks)
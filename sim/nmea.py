@@ -0,0 +1,227 @@
+# NMEA captures for the simulator.
+#
+# A capture is a text file with one received line per line:
+#
+#   # anything after a # is a comment
+#   <ms> <data>
+#
+# where <ms> is the (integer) time in milliseconds since the start of
+# the capture when the line's first byte arrived, and <data> is the
+# line without its \r\n, with any bytes that aren't printable ASCII
+# (or are a backslash) written as \xHH. Plain NMEA logs (no times) are
+# also accepted; their lines are spaced period_ms apart.
+#
+#   python -m sim.nmea record /dev/ttyUSB0 capture.nmea [--seconds N]
+#   python -m sim.nmea synthesize capture.nmea [--hours N] ...
+
+import argparse
+import calendar
+import re
+import sys
+import time
+
+HEADER = "# chalice NMEA capture v1\n"
+
+def checksum(body):
+    "NMEA checksum of the bytes between $ and *"
+    check = 0
+    for c in body:
+        check ^= c
+    return check
+
+def sentence(body):
+    "A complete sentence (with $, checksum and \\r\\n) from its body"
+    return b"$%s*%02X\r\n" % (body, checksum(body))
+
+def _escape(data):
+    return "".join(chr(c) if 32 <= c < 127 and c != 92 else "\\x%02x" % c for c in data)
+
+_ESCAPE = re.compile(rb"\\x([0-9a-fA-F]{2})")
+
+def _unescape(text):
+    return _ESCAPE.sub(lambda m: bytes((int(m.group(1), 16),)), text.encode("ascii"))
+
+def format_line(ms, data):
+    return "%d %s\n" % (ms, _escape(data.rstrip(b"\r\n")))
+
+def load(f, period_ms=1000):
+    """Read a capture from file object (or path) f, returning a list of
+    (ns since the start, bytes with \\r\\n) in time order.
+    """
+    if isinstance(f, str):
+        with open(f) as f:
+            return load(f, period_ms)
+
+    events = []
+    for number, line in enumerate(f):
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("$"):
+            ms = len(events) * period_ms
+            data = line
+        else:
+            ms, _, data = line.partition(" ")
+            ms = int(ms)
+        events.append((ms * 1000000, _unescape(data) + b"\r\n"))
+    events.sort(key=lambda event: event[0])
+    return events
+
+def save(f, events):
+    "Write (ns, bytes) events as a capture"
+    f.write(HEADER)
+    for ns, data in events:
+        f.write(format_line(ns // 1000000, data))
+
+class Recorder:
+    """Wraps a UART (busio.UART, serial.Serial, ...) and writes each
+    line read through it to capture file f, timed by clock.
+    """
+
+    def __init__(self, uart, f, clock):
+        self.uart = uart
+        self.f = f
+        self.clock = clock
+        self.start = clock.monotonic_ns()
+        self._line = bytearray()
+        self._line_start = None
+        f.write(HEADER)
+
+    def _record(self, data):
+        now = self.clock.monotonic_ns()
+        for c in data:
+            if self._line_start is None:
+                self._line_start = now
+            self._line.append(c)
+            if c == 10:
+                self.f.write(format_line((self._line_start - self.start) // 1000000, self._line))
+                self._line = bytearray()
+                self._line_start = None
+
+    @property
+    def in_waiting(self):
+        return self.uart.in_waiting
+
+    def read(self, nbytes=None):
+        data = self.uart.read(nbytes)
+        if data:
+            self._record(data)
+        return data
+
+    def readinto(self, buf):
+        n = self.uart.readinto(buf)
+        if n:
+            self._record(bytes(buf[:n]))
+        return n
+
+    def readline(self):
+        data = self.uart.readline()
+        if data:
+            self._record(data)
+        return data
+
+    def write(self, data):
+        return self.uart.write(data)
+
+def _coordinate(value, width, hemispheres):
+    value, hemisphere = (-value, hemispheres[1:]) if value < 0 else (value, hemispheres[:1])
+    degrees = int(value)
+    minutes = (value - degrees) * 60
+    return b"%0*d%07.4f,%s" % (width, degrees, minutes, hemisphere)
+
+def coordinates(latitude, longitude):
+    "The (latitude, longitude) fields of a fix at latitude, longitude, for rmc()"
+    return _coordinate(latitude, 2, b"NS"), _coordinate(longitude, 3, b"EW")
+
+def rmc(utc, ms=0, position=None):
+    """Body of an RMC sentence sent at UTC epoch time utc plus ms
+    milliseconds, or before the receiver has the time if utc is None.
+    position is the fields from coordinates(), or None for no fix.
+    """
+    if utc is None:
+        return b"GPRMC,,V,,,,,,,,,,N"
+    ts = time.gmtime(utc)
+    stamp = b"%02d%02d%02d.%03d" % (ts.tm_hour, ts.tm_min, ts.tm_sec, ms)
+    date = b"%02d%02d%02d" % (ts.tm_mday, ts.tm_mon, ts.tm_year % 100)
+    if position is None:
+        return b"GPRMC,%s,V,,,,,0.00,0.00,%s,,,N" % (stamp, date)
+    return b"GPRMC,%s,A,%s,%s,0.02,31.66,%s,,,A" % (stamp, position[0], position[1], date)
+
+def synthesize(start, seconds, latitude, longitude, no_time=30, no_fix=30,
+               outage_every=0, outage=0, corrupt_every=0, period_ms=1000):
+    """(ns, bytes) events for a receiver powered on at UTC epoch time
+    start and logged for seconds, sending an RMC sentence every
+    period_ms. It has no time for the first no_time seconds, then time
+    but no fix for no_fix more. After that it loses the fix for outage
+    seconds every outage_every seconds (if set). Every corrupt_every'th
+    sentence (if set) has a bad checksum.
+    """
+    events = []
+    position = coordinates(latitude, longitude)
+    for i in range(seconds * 1000 // period_ms):
+        ms = i * period_ms
+        elapsed = ms // 1000
+        if elapsed < no_time:
+            body = rmc(None)
+        else:
+            fixed = elapsed >= no_time + no_fix
+            if fixed and outage_every and (elapsed - no_time - no_fix) % outage_every >= outage_every - outage:
+                fixed = False
+            body = rmc(start + elapsed, ms % 1000, position if fixed else None)
+        if corrupt_every and i % corrupt_every == corrupt_every - 1:
+            data = b"$%s*%02X\r\n" % (body, checksum(body) ^ 0xff)
+        else:
+            data = sentence(body)
+        events.append((ms * 1000000, data))
+    return events
+
+def _record(args):
+    import serial # pyserial, only needed to record from a real receiver
+    from sim.clock import RealClock
+
+    clock = RealClock()
+    with serial.Serial(args.device, args.baudrate, timeout=1) as port, open(args.output, "w") as f:
+        recorder = Recorder(port, f, clock)
+        end = clock.monotonic() + args.seconds
+        while clock.monotonic() < end:
+            recorder.readline()
+
+def _synthesize(args):
+    start = calendar.timegm(time.strptime(args.start, "%Y-%m-%dT%H:%M:%S"))
+    events = synthesize(start, int(args.hours * 3600), args.latitude, args.longitude,
+                        no_time=args.no_time, no_fix=args.no_fix,
+                        outage_every=args.outage_every, outage=args.outage,
+                        corrupt_every=args.corrupt_every)
+    with open(args.output, "w") as f:
+        save(f, events)
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or synthesize NMEA captures")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="record from a serial port (needs pyserial)")
+    record.add_argument("device")
+    record.add_argument("output")
+    record.add_argument("--baudrate", type=int, default=9600)
+    record.add_argument("--seconds", type=float, default=600)
+    record.set_defaults(run=_record)
+
+    synth = commands.add_parser("synthesize", help="write a synthetic capture")
+    synth.add_argument("output")
+    synth.add_argument("--start", default="2024-06-01T00:00:00", help="UTC power on time")
+    synth.add_argument("--hours", type=float, default=1)
+    synth.add_argument("--latitude", type=float, default=40.0)
+    synth.add_argument("--longitude", type=float, default=-75.0)
+    synth.add_argument("--no-time", type=int, default=30)
+    synth.add_argument("--no-fix", type=int, default=30)
+    synth.add_argument("--outage-every", type=int, default=0)
+    synth.add_argument("--outage", type=int, default=0)
+    synth.add_argument("--corrupt-every", type=int, default=0)
+    synth.set_defaults(run=_synthesize)
+
+    args = parser.parse_args()
+    args.run(args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
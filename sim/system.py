@@ -0,0 +1,263 @@
+# Runs the whole of code.py (Control, GPS, the flicker and Debug, on
+# the statemachines executive) against the stand-in hardware on a
+# virtual clock:
+#
+#   python -m sim.system [--days N] [--start YYYY-MM-DDTHH:MM:SS]
+#                        [--latitude DEG] [--longitude DEG]
+#                        [--rtc-drift PPM] [--min-period SECONDS]
+#                        [--switch SECONDS:on|auto ...]
+#                        [--gps-outage SECONDS:DURATION ...]
+#                        [--nvm FILE] [--rtc-kept]
+#                        [--console FILE] [--json FILE]
+#
+# The GPS is a sim.uart.ReceiverUART at the given position, powered on
+# (like the board) at --start, and the mode switch follows --switch
+# (automatic until told otherwise). The board's RTC starts at
+# 2000-01-01, as after a power cycle, or with --rtc-kept at --start
+# (as after a reset that didn't lose the time), and gains --rtc-drift
+# ppm. With --nvm, microcontroller.nvm is loaded from FILE (if it
+# exists) and written back at the end, so a run can boot from what the
+# last one saved (see persist.py). What code.py prints goes to
+# --console (nowhere by default). It reports
+#
+#  * per machine, the state function calls (ticks) it made and the host
+#    CPU time they took per simulated hour, and the executive's
+#    wake-ups per day
+#  * the lamp's on/off transitions in automatic mode against astral's
+#    sunset/sunrise for the true time and place
+#
+# Pulsers faster than --min-period (the flicker's 10 ms, Control's
+# 0.5 s) only run every --min-period seconds, standing in for the
+# ticks they skip (see sim.machines.Executive); that also limits how
+# closely the transitions can follow the schedule. Use --min-period 0
+# for every tick (and a shorter run).
+
+import argparse
+import calendar
+import contextlib
+import json
+import os
+import sys
+import time
+
+from sim import machines
+from sim.clock import VirtualClock, VirtualRTC
+from sim.hardware import install
+from sim.uart import ReceiverUART
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CODE = os.path.join(HERE, "code.py")
+
+BOARD_EPOCH = (2000, 1, 1, 0, 0, 0, 5, 1, 0) # RTC after a reset
+
+def switch_script(changes):
+    """mode_switch value (True for manual on) as a function of clock ns,
+    from (seconds, "on" or "auto") changes
+    """
+    changes = sorted((int(seconds * machines.SECONDS_PER_NS), mode == "on")
+                     for seconds, mode in changes)
+    def value(now):
+        on = False
+        for t, mode in changes:
+            if t > now:
+                break
+            on = mode
+        return on
+    return value
+
+class LampLog:
+    """Watches Control's dispatches for the lamp turning on and off,
+    and compares the automatic ones with astral's schedule.
+    """
+
+    def __init__(self, module, utc_start, latitude, longitude):
+        import astral
+        self.astral = astral
+        self.module = module
+        self.utc_start = utc_start
+        self.latitude = latitude
+        self.longitude = longitude
+        self._epoch = astral.Date(1970, 1, 1).toordinal() * astral.SECS_PER_DAY
+
+        self.lamp = False
+        self.settled = False    # in automatic mode since the last transition
+        self.transitions = []   # (utc, on, automatic, error seconds or None)
+
+    def utc(self, now):
+        return self.utc_start + now / machines.SECONDS_PER_NS
+
+    def expected(self, utc, on):
+        "astral's sunset (on) or sunrise (off) nearest utc, as a UTC epoch time"
+        astral = self.astral
+        event = astral.sunset_utc if on else astral.sunrise_utc
+        day = astral.Date.fromtimestamp(time.gmtime(utc))
+        best = None
+        for offset in (-1, 0, 1):
+            try:
+                t = event(day + offset, self.latitude, self.longitude).toordinal() - self._epoch
+            except astral.AstralError:
+                continue
+            if best is None or abs(t - utc) < abs(best - utc):
+                best = t
+        return best
+
+    def after_dispatch(self, machine, state, now):
+        controller = getattr(self.module, "controller", None)
+        if machine is not controller:
+            return
+        name = state.__name__
+        automatic = name in ("auto_on", "auto_off")
+
+        lamp = controller.lamp_on()
+        if lamp != self.lamp:
+            utc = self.utc(now)
+            error = None
+            if automatic and self.settled:
+                expected = self.expected(utc, lamp)
+                if expected is not None:
+                    error = utc - expected
+            self.transitions.append((utc, lamp, automatic, error))
+            self.lamp = lamp
+        self.settled = automatic or (self.settled and name in ("auto_poll", "enter_automatic"))
+
+    def scheduled(self, utc_start, utc_end):
+        "Number of sunsets and sunrises between the two times"
+        astral = self.astral
+        count = 0
+        day = astral.Date.fromtimestamp(time.gmtime(utc_start))
+        while True:
+            events = []
+            for event in (astral.sunrise_utc, astral.sunset_utc):
+                try:
+                    events.append(event(day, self.latitude, self.longitude).toordinal() - self._epoch)
+                except astral.AstralError:
+                    pass
+            if events and min(events) > utc_end:
+                return count
+            count += sum(1 for t in events if utc_start < t <= utc_end)
+            day = day + 1
+
+def simulate(days, start, latitude, longitude, rtc_drift=0, min_period=30,
+             switch=(), outages=(), console=os.devnull, nvm=None, rtc_kept=False):
+    "Run code.py for days from UTC epoch time start, returning the results"
+    clock = VirtualClock()
+    rtc = VirtualRTC(clock, time.gmtime(start) if rtc_kept else BOARD_EPOCH, drift_ppm=rtc_drift)
+    hardware = install(clock, rtc)
+    if nvm is not None and os.path.exists(nvm):
+        hardware.nvm.load(nvm)
+    uart = ReceiverUART(clock, start, latitude, longitude, outages=outages)
+    hardware.uarts.append(uart)
+    hardware.inputs["D9"] = switch_script(switch)
+
+    end = int(days * 86400 * machines.SECONDS_PER_NS)
+    executive = machines.configure(clock, end, min_period=min_period)
+
+    t0 = time.perf_counter()
+    with open(console, "w") as out, contextlib.redirect_stdout(out):
+        code = hardware.load(CODE, "chalice_code")
+        lamp = LampLog(code, start, latitude, longitude)
+        executive.after_dispatch = lamp.after_dispatch
+        code.main()
+    elapsed = time.perf_counter() - t0
+    if nvm is not None:
+        hardware.nvm.save(nvm)
+
+    hours = days * 24
+    scheduled = [t for t in lamp.transitions if t[3] is not None]
+    errors = [abs(t[3]) for t in scheduled]
+    automatic = [t for t in lamp.transitions if t[2]]
+    first_automatic = automatic[0][0] if automatic else None
+
+    return {
+        "days": days,
+        "wall_seconds": elapsed,
+        "speedup": hours * 3600 / elapsed,
+        "min_period": min_period,
+        "wakeups_per_day": executive.wakeups / days,
+        "machines": [{"name": stats.name,
+                      "dispatches": stats.dispatches,
+                      "ticks": stats.ticks,
+                      "ticks_per_day": stats.ticks / days,
+                      "cpu_ms_per_hour": 1000 * stats.cpu / hours}
+                     for stats in executive.stats],
+        "lamp": {
+            "transitions": [{"utc": utc, "on": on, "automatic": auto, "error": error}
+                            for utc, on, auto, error in lamp.transitions],
+            "first_automatic": first_automatic,
+            "scheduled": lamp.scheduled(first_automatic, start + hours * 3600)
+                         if first_automatic is not None else 0,
+            "matched": len(scheduled),
+            "max_error": max(errors) if errors else None,
+            "mean_error": sum(errors) / len(errors) if errors else None,
+        },
+        "pwm_writes": {name: pwm.writes for name, pwm in hardware.pwm.items()},
+        "rtc_sets": len(rtc.sets),
+        "nvm_writes": hardware.nvm.writes,
+        "gps_bytes_dropped": uart.dropped,
+    }
+
+def _change(text):
+    seconds, _, value = text.partition(":")
+    return float(seconds), value
+
+def _format_utc(utc):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(utc))
+
+def main():
+    parser = argparse.ArgumentParser(description="simulate code.py on the stand-in hardware")
+    parser.add_argument("--days", type=float, default=365)
+    parser.add_argument("--start", default="2024-01-01T00:00:00", help="UTC power on time")
+    parser.add_argument("--latitude", type=float, default=40.0)
+    parser.add_argument("--longitude", type=float, default=-75.0)
+    parser.add_argument("--rtc-drift", type=float, default=20, help="RTC drift, ppm (fast if positive)")
+    parser.add_argument("--min-period", type=float, default=30,
+                        help="run faster Pulsers this often (seconds), 0 for every tick")
+    parser.add_argument("--switch", type=_change, action="append", default=[],
+                        metavar="SECONDS:on|auto", help="mode switch change, seconds after start")
+    parser.add_argument("--gps-outage", type=_change, action="append", default=[],
+                        metavar="SECONDS:DURATION", help="GPS loses its fix")
+    parser.add_argument("--nvm", help="microcontroller.nvm image, loaded and saved")
+    parser.add_argument("--rtc-kept", action="store_true",
+                        help="the RTC starts at --start rather than 2000-01-01")
+    parser.add_argument("--console", default=os.devnull, help="where code.py's prints go")
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args()
+
+    for _, mode in args.switch:
+        if mode not in ("on", "auto"):
+            parser.error("--switch mode must be on or auto, not %r" % mode)
+    outages = [(seconds, float(duration)) for seconds, duration in args.gps_outage]
+
+    start = calendar.timegm(time.strptime(args.start, "%Y-%m-%dT%H:%M:%S"))
+    result = simulate(args.days, start, args.latitude, args.longitude, args.rtc_drift,
+                      args.min_period, args.switch, outages, args.console,
+                      args.nvm, args.rtc_kept)
+
+    print("%g days in %.1f s (%.0fx), %.1f wake-ups/day, %d RTC sets, %d GPS bytes dropped, %d NVM writes"
+          % (result["days"], result["wall_seconds"], result["speedup"],
+             result["wakeups_per_day"], result["rtc_sets"], result["gps_bytes_dropped"],
+             result["nvm_writes"]))
+    for stats in result["machines"]:
+        print("  %-12s %12.0f ticks %10.0f/day %8.2f ms CPU/hour"
+              % (stats["name"], stats["ticks"], stats["ticks_per_day"], stats["cpu_ms_per_hour"]))
+
+    lamp = result["lamp"]
+    if lamp["first_automatic"] is None:
+        print("  lamp: never in automatic mode")
+    else:
+        print("  lamp: automatic from %s, %d of %d sunsets/sunrises followed, error max %s mean %s"
+              % (_format_utc(lamp["first_automatic"]), lamp["matched"], lamp["scheduled"],
+                 "%.0f s" % lamp["max_error"] if lamp["matched"] else "-",
+                 "%.0f s" % lamp["mean_error"] if lamp["matched"] else "-"))
+    for transition in lamp["transitions"][:6]:
+        print("    %s %-3s %s%s" % (_format_utc(transition["utc"]), "on" if transition["on"] else "off",
+                                    "auto" if transition["automatic"] else "manual",
+                                    "" if transition["error"] is None else " %+.0f s" % transition["error"]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=1)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
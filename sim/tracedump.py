@@ -0,0 +1,61 @@
+# Decodes the trace dumps (see tracer.py) in a console log:
+#
+#   python -m sim.tracedump [console.log ...] [--json]
+#
+# Each event is printed as
+#
+#   <seconds since boot> <event name> <argument>
+#
+# where the seconds wrap every tracer.TICKS_PERIOD ms (about 6.2 days),
+# like the board's supervisor.ticks_ms(), or, with --json, as one JSON
+# object a line. Anything in the log that isn't a dump is skipped;
+# reads stdin if no logs are given.
+
+import argparse
+import fileinput
+import json
+import struct
+import sys
+
+import tracer
+
+def decode(lines):
+    """(event number, ms, name, arg) for each event in the dumps in
+    lines, and ("lost", count) for events overwritten before a dump
+    """
+    number = 0
+    for line in lines:
+        words = line.split()
+        if len(words) == 3 and words[0] == "TRACE":
+            number = int(words[1])
+            lost = int(words[2])
+            if lost:
+                yield "lost", lost
+        elif len(words) == 2 and words[0] == "TRACE+":
+            data = bytes.fromhex(words[1])
+            for ms, code, arg in struct.iter_unpack(tracer.RECORD, data):
+                yield number, ms, tracer.NAMES.get(code, "event_%d" % code), arg
+                number += 1
+
+def main():
+    parser = argparse.ArgumentParser(description="decode tracer.py dumps in a console log")
+    parser.add_argument("logs", nargs="*")
+    parser.add_argument("--json", action="store_true", help="one JSON object per event")
+    args = parser.parse_args()
+
+    for event in decode(fileinput.input(args.logs)):
+        if event[0] == "lost":
+            if args.json:
+                print(json.dumps({"lost": event[1]}))
+            else:
+                print("... %d events lost" % event[1])
+            continue
+        number, ms, name, arg = event
+        if args.json:
+            print(json.dumps({"n": number, "ms": ms, "event": name, "arg": arg}))
+        else:
+            print("%12.3f %-14s %d" % (ms / 1000, name, arg))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
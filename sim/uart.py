@@ -0,0 +1,308 @@
+# busio.UART stand-in that replays an NMEA capture (see sim.nmea).
+#
+# Bytes arrive at the line rate (10 bits a byte at baudrate), starting
+# when the capture says each line did, measured on a clock (see
+# sim.clock) from when the UART was created. speedup compresses the
+# capture's times and the line rate, speedup=None delivers the whole
+# capture at once. Like the real thing, bytes that arrive while the
+# receive buffer (buffer_size, 64 by default on CircuitPython) is full
+# are dropped.
+#
+# ReceiverUART makes up its sentences as they are due instead, for runs
+# too long for a capture.
+
+from sim import nmea
+
+class ReplayUART:
+    def __init__(self, events, clock, speedup=1, baudrate=9600, buffer_size=64, timeout=0):
+        self.events = events
+        self.clock = clock
+        self.speedup = speedup
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.start = clock.monotonic_ns()
+
+        if speedup is None:
+            self.buffer_size = None
+            self._byte_ns = 0
+        else:
+            self.buffer_size = buffer_size
+            self._byte_ns = int(10 * 1000000000 / baudrate / speedup)
+
+        self._rx = bytearray()
+        self._event = 0         # next event to (finish) delivering
+        self._offset = 0        # bytes of it delivered
+        self._line_free = 0     # when the line finished the previous one
+
+        self.received = 0       # bytes delivered into the buffer
+        self.dropped = 0        # and lost to a full buffer
+        self.written = []       # everything written, a bytes per write()
+
+    def finished(self):
+        "True once all of the capture has been read"
+        self._pump()
+        return self._event == len(self.events) and not self._rx
+
+    def next_arrival_ns(self):
+        "Clock time the next byte arrives, or None at the end"
+        if self._event == len(self.events):
+            return None
+        t, _ = self.events[self._event]
+        start = self._event_start(t)
+        return self.start + start + self._offset * self._byte_ns
+
+    def _event_start(self, t):
+        if self.speedup is None:
+            return 0
+        return max(int(t / self.speedup), self._line_free)
+
+    def _deliver(self, data):
+        room = len(data)
+        if self.buffer_size is not None:
+            room = max(0, min(room, self.buffer_size - len(self._rx)))
+        self._rx += data[:room]
+        self.received += room
+        self.dropped += len(data) - room
+
+    def _pump(self):
+        # Move everything that has arrived by now into the buffer
+        now = self.clock.monotonic_ns() - self.start
+        while self._event < len(self.events):
+            t, data = self.events[self._event]
+            start = self._event_start(t)
+            if now < start:
+                return
+
+            if self._byte_ns:
+                arrived = min(len(data), (now - start) // self._byte_ns + 1)
+            else:
+                arrived = len(data)
+            self._deliver(data[self._offset:arrived])
+            if arrived < len(data):
+                self._offset = arrived
+                return
+
+            self._line_free = start + len(data) * self._byte_ns
+            self._event += 1
+            self._offset = 0
+
+    @property
+    def in_waiting(self):
+        self._pump()
+        return len(self._rx)
+
+    def read(self, nbytes=None):
+        self._pump()
+        if not self._rx:
+            return None
+        if nbytes is None:
+            nbytes = len(self._rx)
+        data = bytes(self._rx[:nbytes])
+        del self._rx[:nbytes]
+        return data
+
+    def readinto(self, buf):
+        self._pump()
+        n = min(len(buf), len(self._rx))
+        if n == 0:
+            return None
+        buf[:n] = self._rx[:n]
+        del self._rx[:n]
+        return n
+
+    def readline(self):
+        self._pump()
+        end = self._rx.find(b"\n")
+        if end < 0:
+            return None
+        return self.read(end + 1)
+
+    def reset_input_buffer(self):
+        self._pump()
+        del self._rx[:]
+
+    def write(self, data):
+        self.written.append(bytes(data))
+        return len(data)
+
+    def deinit(self):
+        pass
+
+def mtk_start(asleep):
+    "Seconds an MTK module takes to get a fix after asleep seconds powered down"
+    if asleep < 4 * 3600:
+        return 1    # hot start, ephemeris still good
+    return 33       # warm start
+
+class _ForceOn:
+    # The module's FORCE_ON pin, a digitalio.DigitalInOut stand-in
+    def __init__(self, uart):
+        self._uart = uart
+        self._value = False
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        if value and not self._value:
+            self._uart._wake()
+        self._value = value
+
+class ScriptedUART(ReplayUART):
+    """ReplayUART that behaves like an MTK module's power states, and
+    checks the commands written to it against script.
+
+    script is the sentences (with $, checksum and \\r\\n) expected, in
+    order; anything written past its end isn't checked. Mismatches are
+    collected in errors. After PMTK161,0 (standby) the module stops
+    sending until the next byte written to it, after PMTK225,4 (backup)
+    until force_on (see _ForceOn) goes high. It then sends nothing for
+    start(seconds asleep) seconds.
+    """
+
+    def __init__(self, events, clock, script=(), start=mtk_start, **kwargs):
+        ReplayUART.__init__(self, events, clock, **kwargs)
+        self.script = list(script)
+        self.start_time = start
+        self.force_on = _ForceOn(self)
+
+        self.commands = []      # complete sentences written
+        self.errors = []
+        self.mode = None        # None (on), "standby" or "backup"
+        self.asleep_at = None
+        self.silent_until = 0   # clock ns
+        self.asleep_ns = 0      # total time powered down
+        self.wakes = []         # (clock ns, start seconds)
+        self._partial = bytearray()
+
+    def _deliver(self, data):
+        now = self.clock.monotonic_ns()
+        if self.mode is not None or now < self.silent_until:
+            return
+        ReplayUART._deliver(self, data)
+
+    def _wake(self):
+        if self.mode is None:
+            return
+        self._pump()    # discard what was sent while asleep
+        now = self.clock.monotonic_ns()
+        asleep = now - self.asleep_at
+        self.asleep_ns += asleep
+        start = self.start_time(asleep / 1e9)
+        self.wakes.append((now, start))
+        self.silent_until = now + int(start * 1e9)
+        self.mode = None
+
+    def _command(self, sentence):
+        n = len(self.commands)
+        self.commands.append(sentence)
+        if n < len(self.script) and sentence != self.script[n]:
+            self.errors.append("command %d: %r, expected %r" % (n, sentence, self.script[n]))
+
+        if sentence.startswith(b"$PMTK161,0*"):
+            self.mode = "standby"
+        elif sentence.startswith(b"$PMTK225,4*"):
+            self.mode = "backup"
+        else:
+            return
+        self._pump()
+        self.asleep_at = self.clock.monotonic_ns()
+        del self._rx[:]
+
+    def write(self, data):
+        if self.mode == "standby":
+            self._wake()
+        self._partial += data
+        while True:
+            end = self._partial.find(b"\n")
+            if end < 0:
+                break
+            self._command(bytes(self._partial[:end + 1]))
+            del self._partial[:end + 1]
+        return ReplayUART.write(self, data)
+
+    def on_fraction(self):
+        "Fraction of the time since the UART was created the module was on"
+        now = self.clock.monotonic_ns()
+        asleep = self.asleep_ns
+        if self.mode is not None:
+            asleep += now - self.asleep_at
+        return 1 - asleep / max(now - self.start, 1)
+
+class ReceiverUART(ReplayUART):
+    """ReplayUART for a receiver at latitude, longitude, powered on
+    when the UART is created at UTC epoch time start. Like
+    sim.nmea.synthesize() it sends an RMC sentence every period_ms, with
+    no time for no_time seconds and then no fix for no_fix more, and
+    it has no fix during outages ((seconds after start, duration)
+    pairs). The sentences are made as they arrive, and ones that
+    arrive while the buffer is full are skipped without being made, so
+    it can run for a simulated year.
+    """
+
+    def __init__(self, clock, start, latitude, longitude, no_time=30, no_fix=30,
+                 outages=(), period_ms=1000, **kwargs):
+        ReplayUART.__init__(self, (), clock, **kwargs)
+        self.utc_start = start
+        self.position = nmea.coordinates(latitude, longitude)
+        self.no_time = no_time
+        self.no_fix = no_fix
+        self.outages = sorted(outages)
+        self.period_ms = period_ms
+        self._period_ns = period_ms * 1000000
+        self._data = None       # sentence self._event, once it has started
+
+    def _fixed(self, elapsed):
+        if elapsed < self.no_time + self.no_fix:
+            return False
+        for start, seconds in self.outages:
+            if start <= elapsed < start + seconds:
+                return False
+        return True
+
+    def sentence(self, i):
+        "The i'th sentence sent"
+        ms = i * self.period_ms
+        elapsed = ms // 1000
+        if elapsed < self.no_time:
+            return nmea.sentence(nmea.rmc(None))
+        position = self.position if self._fixed(elapsed) else None
+        return nmea.sentence(nmea.rmc(self.utc_start + elapsed, ms % 1000, position))
+
+    def finished(self):
+        return False
+
+    def next_arrival_ns(self):
+        return self.start + self._event * self._period_ns + self._offset * self._byte_ns
+
+    def _pump(self):
+        now = self.clock.monotonic_ns() - self.start
+        while True:
+            start = self._event * self._period_ns
+            if now < start:
+                return
+
+            if self._offset == 0 and len(self._rx) >= self.buffer_size:
+                # Full, skip to the sentence arriving now; the ones in
+                # between would all be dropped
+                current = now // self._period_ns
+                if current > self._event:
+                    self.dropped += (current - self._event) * len(self.sentence(current))
+                    self._event = current
+                    self._data = None
+                    continue
+
+            data = self._data
+            if data is None:
+                data = self._data = self.sentence(self._event)
+            arrived = min(len(data), (now - start) // self._byte_ns + 1)
+            self._deliver(data[self._offset:arrived])
+            if arrived < len(data):
+                self._offset = arrived
+                return
+
+            self._event += 1
+            self._offset = 0
+            self._data = None
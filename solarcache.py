@@ -0,0 +1,102 @@
+# Cache of solar calculations for the position we're at.
+#
+# GPS fixes jitter by metres from one to the next, which moves the sun
+# events by a fraction of a second but would make anything keyed on the
+# exact position recompute from scratch. Positions are quantized to a
+# grid (0.01 degrees, about a kilometre, by default) and everything is
+# computed for, and kept while we're within threshold degrees of, the
+# first grid point we were seen at: the astral.Observer, a
+# darkness.DarknessIndex, and the events of recently asked for days.
+
+import astral
+import darkness
+
+class SolarCache:
+    def __init__(self, grid=0.01, threshold=0.05, days=8, depression=None):
+        self.grid = grid
+        self.threshold = threshold
+        self.depression = depression # for the darkness index
+
+        self.observer = None
+        self._index = None
+
+        # Recent days' SolarDays, a small ring like astral's solar cache
+        self._ordinals = [None] * days
+        self._days = [None] * days
+        self._next = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _quantize(self, degrees):
+        return round(degrees / self.grid) * self.grid
+
+    def invalidate(self):
+        "Forget everything, e.g. if the clock has jumped"
+        self.observer = None
+        self._index = None
+        for i in range(len(self._ordinals)):
+            self._ordinals[i] = None
+            self._days[i] = None
+        self.invalidations += 1
+
+    def observer_at(self, latitude, longitude):
+        """astral.Observer for the grid point nearest latitude/longitude,
+        unless we're still within threshold of the current one.
+        """
+        latitude = self._quantize(latitude)
+        longitude = self._quantize(longitude)
+        observer = self.observer
+        if observer is not None:
+            if (abs(observer.latitude - latitude) <= self.threshold and
+                abs(observer.longitude - longitude) <= self.threshold):
+                return observer
+            self.invalidate()
+
+        observer = self.observer = astral.Observer(latitude, longitude)
+        return observer
+
+    def darkness_at(self, t, latitude, longitude):
+        """(dark, next change) at DateSeconds t, see darkness.DarknessIndex.
+        The index is (re)built if we've moved, or the RTC has been set
+        back past its start.
+        """
+        observer = self.observer_at(latitude, longitude)
+        index = self._index
+        if index is not None:
+            try:
+                result = index.is_dark(t), index.next_change(t)
+                self.hits += 1
+                return result
+            except ValueError:
+                pass
+
+        self.misses += 1
+        index = self._index = darkness.DarknessIndex(observer, t, self.depression)
+        return index.is_dark(t), index.next_change(t)
+
+    def solar_day(self, date, latitude, longitude):
+        "astral.SolarDay for date at (the grid point near) latitude/longitude"
+        observer = self.observer_at(latitude, longitude)
+        ordinal = date.toordinal()
+        for i in range(len(self._ordinals)):
+            if self._ordinals[i] == ordinal:
+                self.hits += 1
+                return self._days[i]
+
+        self.misses += 1
+        day = observer.solar_day(date)
+        i = self._next
+        self._ordinals[i] = ordinal
+        self._days[i] = day
+        self._next = (i + 1) % len(self._ordinals)
+        return day
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def __str__(self):
+        return (f"{self.__class__.__name__}:{self.observer and (self.observer.latitude, self.observer.longitude)} "
+                f"{self.hits} hits/{self.misses} misses/{self.invalidations} invalidations")
@@ -0,0 +1,160 @@
+# Opt-in profiling of state function dispatches. Profiler.machine(m)
+# wraps a state machine so every state function it runs is timed, with
+# the results kept per (machine, state __name__) in fixed size arrays:
+#
+#   calls      dispatches
+#   total_us   time in the state function
+#   max_us     the longest of those
+#   late_us    total time from when the trigger that led to the
+#              dispatch was due to the dispatch, for the triggers in
+#              triggers.py (OneShot and Pulser, which say when)
+#   late_max_us, late_count (over late_threshold_us)
+#
+# dump() prints them and starts again, so call it regularly (Debug does,
+# hourly) to keep the microsecond totals from overflowing.
+
+import array
+import time
+
+class _Profiled:
+    # A state function, timed; the executive calls this instead
+    def __init__(self, profiler, machine, state):
+        self.profiler = profiler
+        self.machine = machine
+        self.state = state
+        self.__name__ = state.__name__
+        self.slot = profiler._slot(machine, state.__name__)
+
+    def __call__(self, now):
+        return self.profiler._dispatch(self, now)
+
+class Profiler:
+    def __init__(self, size=24, late_threshold_us=2000):
+        self.size = size
+        self.late_threshold_us = late_threshold_us
+        self.names = []         # "machine.state" for each slot in use
+        self._slots = {}        # (machine index, state name) -> slot
+        self._machines = []     # wrapped machines
+        self._wrappers = {}     # slot -> its _Profiled
+        self._deadlines = []    # per machine, ns the pending trigger is due or -1
+        self._pulsers = []      # per machine, the Pulser it last returned
+        self.overflow = 0       # dispatches of states that didn't get a slot
+
+        self.calls = array.array('L', (0 for _ in range(size)))
+        self.total_us = array.array('L', (0 for _ in range(size)))
+        self.max_us = array.array('L', (0 for _ in range(size)))
+        self.late_us = array.array('L', (0 for _ in range(size)))
+        self.late_max_us = array.array('L', (0 for _ in range(size)))
+        self.late_count = array.array('L', (0 for _ in range(size)))
+
+    def machine(self, machine):
+        "Wrap machine (something with start(now)) for registering"
+        self._machines.append(machine)
+        self._deadlines.append(-1)
+        self._pulsers.append(None)
+        return _Machine(self, len(self._machines) - 1)
+
+    def _slot(self, machine, name):
+        key = (machine, name)
+        slot = self._slots.get(key)
+        if slot is None:
+            if len(self.names) == self.size:
+                return -1
+            slot = len(self.names)
+            self._slots[key] = slot
+            self.names.append(self._machines[machine].__class__.__name__ + "." + name)
+        return slot
+
+    def _wrap(self, machine, state):
+        # A slot is one state of one machine, so its wrapper can be reused
+        slot = self._slot(machine, state.__name__)
+        wrapper = self._wrappers.get(slot) if slot >= 0 else None
+        if wrapper is None:
+            wrapper = _Profiled(self, machine, state)
+            if slot >= 0:
+                self._wrappers[slot] = wrapper
+        return wrapper
+
+    def _dispatch(self, wrapper, now):
+        start = time.monotonic_ns()
+        next_state, trigger = wrapper.state(now)
+        end = time.monotonic_ns()
+
+        machine = wrapper.machine
+        slot = wrapper.slot
+        if slot < 0:
+            self.overflow += 1
+        else:
+            us = (end - start) // 1000
+            self.calls[slot] += 1
+            self.total_us[slot] += us
+            if us > self.max_us[slot]:
+                self.max_us[slot] = us
+
+            deadline = self._deadlines[machine]
+            if deadline >= 0:
+                late = (start - deadline) // 1000
+                if late > 0:
+                    self.late_us[slot] += late
+                    if late > self.late_max_us[slot]:
+                        self.late_max_us[slot] = late
+                    if late > self.late_threshold_us:
+                        self.late_count[slot] += 1
+
+        self._deadlines[machine] = self._due(machine, trigger, now, start)
+
+        if next_state is not None:
+            next_state = self._wrap(machine, next_state)
+        return next_state, trigger
+
+    def _due(self, machine, trigger, now, start):
+        # When the trigger just returned will run the machine again, -1
+        # if that can't be told
+        due = getattr(trigger, "due_ns", None)
+        if due is not None:
+            self._pulsers[machine] = None
+            return due
+        every = getattr(trigger, "every_ns", None)
+        if every is None:
+            self._pulsers[machine] = None
+            return -1
+        deadline = self._deadlines[machine]
+        if trigger is not self._pulsers[machine] or deadline < 0:
+            # Don't know its phase yet, take it from here
+            self._pulsers[machine] = trigger
+            return now + every
+        # The pulse after the one just dispatched, skipping any missed
+        return deadline + ((start - deadline) // every + 1) * every
+
+    def reset(self):
+        for column in (self.calls, self.total_us, self.max_us,
+                       self.late_us, self.late_max_us, self.late_count):
+            for slot in range(self.size):
+                column[slot] = 0
+        self.overflow = 0
+
+    def dump(self):
+        "Print the counts since the last dump, and reset them"
+        print(f"{self.__class__.__name__}: calls mean/max us, late mean/max us, late > {self.late_threshold_us}us")
+        for slot, name in enumerate(self.names):
+            calls = self.calls[slot]
+            if not calls:
+                continue
+            print(f" {name}: {calls} {self.total_us[slot] // calls}/{self.max_us[slot]}"
+                  f" {self.late_us[slot] // calls}/{self.late_max_us[slot]} {self.late_count[slot]}")
+        if self.overflow:
+            print(f" {self.overflow} dispatches of states without a slot")
+        self.reset()
+
+class _Machine:
+    # What's registered in place of a machine
+    def __init__(self, profiler, index):
+        self.profiler = profiler
+        self.index = index
+        self.machine = profiler._machines[index]
+
+    def start(self, now):
+        return self.profiler._wrap(self.index, self.machine.start)(now)
+
+    def __getattr__(self, name):
+        return getattr(self.machine, name)
@@ -0,0 +1,117 @@
+# Event tracing for the hot paths, instead of printing. An event is a
+# code (below) and one integer argument, recorded with the time in a
+# preallocated ring, so recording allocates nothing and formats
+# nothing. The time is supervisor.ticks_ms(), which stays a small int
+# (it wraps every 2**29 ms, about 6.2 days) where monotonic_ns() would
+# be a long int on the board. error(), info() and debug() record at
+# their level; set_level() rebinds the ones above it to a function that
+# does nothing, so a disabled trace point costs only the call.
+#
+# dump() prints the records since the last dump as hex, for the host to
+# decode (python -m sim.tracedump console.log).
+
+import array
+import binascii
+import struct
+
+try:
+    from supervisor import ticks_ms
+except ImportError:
+    # On a host
+    import time
+
+    def ticks_ms():
+        return time.monotonic_ns() // 1000000 % TICKS_PERIOD
+
+# ticks_ms() wraps at this
+TICKS_PERIOD = 1 << 29
+
+OFF   = 0
+ERROR = 1
+INFO  = 2
+DEBUG = 3
+
+# Event codes, and what the argument is
+GPS_POLL     = 1  # bytes waiting in the UART
+GPS_SENTENCE = 2  # length of a sentence with a good checksum
+GPS_CHECKSUM = 3  # checksum errors so far
+GPS_OVERRUN  = 4  # buffer overruns so far
+GPS_FIX      = 5  # polls the fix took
+GPS_RTC_SET  = 6  # RTC correction, seconds
+GPS_SLEEP    = 7  # seconds until the module is woken
+GPS_WAKE     = 8  # power mode (1 standby, 2 backup)
+LAMP_ON      = 9  # automatic mode, seconds until the next check
+LAMP_OFF     = 10 # automatic mode, seconds until the next check
+LAMP_MANUAL  = 11 # mode switch value
+
+NAMES = {GPS_POLL: "gps_poll", GPS_SENTENCE: "gps_sentence", GPS_CHECKSUM: "gps_checksum",
+         GPS_OVERRUN: "gps_overrun", GPS_FIX: "gps_fix", GPS_RTC_SET: "gps_rtc_set",
+         GPS_SLEEP: "gps_sleep", GPS_WAKE: "gps_wake", LAMP_ON: "lamp_on",
+         LAMP_OFF: "lamp_off", LAMP_MANUAL: "lamp_manual"}
+
+# One record as dumped: ms (ticks_ms(), so mod TICKS_PERIOD), code,
+# argument
+RECORD = "<IHi"
+RECORD_SIZE = struct.calcsize(RECORD)
+
+class Ring:
+    def __init__(self, size=256):
+        self.size = size
+        self._ms = array.array('L', (0 for _ in range(size)))
+        self._codes = array.array('H', (0 for _ in range(size)))
+        self._args = array.array('l', (0 for _ in range(size)))
+        self.count = 0      # events recorded, including overwritten ones
+        self.dumped = 0     # count at the last dump
+
+    def record(self, code, arg=0):
+        i = self.count % self.size
+        self._ms[i] = ticks_ms()
+        self._codes[i] = code
+        self._args[i] = arg
+        self.count += 1
+
+    def records(self, start=0):
+        "(ms, code, arg) of the events from count start on that are still held"
+        start = max(start, self.count - self.size)
+        for n in range(start, self.count):
+            i = n % self.size
+            yield self._ms[i], self._codes[i], self._args[i]
+
+    def dump(self, per_line=16):
+        """Print the events since the last dump:
+            TRACE <first event number> <events lost>
+            TRACE+ <hex of up to per_line records>
+        """
+        start = max(self.dumped, self.count - self.size)
+        print("TRACE", start, start - self.dumped)
+        line = bytearray()
+        for n, record in enumerate(self.records(start)):
+            line += struct.pack(RECORD, *record)
+            if n % per_line == per_line - 1:
+                print("TRACE+", binascii.hexlify(line).decode())
+                line = bytearray()
+        if line:
+            print("TRACE+", binascii.hexlify(line).decode())
+        self.dumped = self.count
+
+ring = Ring()
+
+def _nothing(code, arg=0):
+    pass
+
+error = info = debug = _nothing
+level = OFF
+
+def set_level(new_level):
+    "Record events at new_level and below (OFF records nothing)"
+    global error, info, debug, level
+    level = new_level
+    record = ring.record
+    error = record if new_level >= ERROR else _nothing
+    info = record if new_level >= INFO else _nothing
+    debug = record if new_level >= DEBUG else _nothing
+
+def dump():
+    ring.dump()
+
+set_level(INFO)
@@ -0,0 +1,23 @@
+# The statemachines triggers the device code uses, remembering when
+# they are due. The statemachines classes don't say, and
+# stateprof.Profiler needs to know to tell how late the executive ran
+# the state a trigger was returned with:
+#
+#   due_ns     OneShot: when it fires
+#   every_ns   Pulser: its period
+
+import statemachines
+
+class OneShot(statemachines.OneShot):
+    "Trigger once, delay_ns after now"
+
+    def __init__(self, now, delay_ns):
+        statemachines.OneShot.__init__(self, now, delay_ns)
+        self.due_ns = now + delay_ns
+
+class Pulser(statemachines.Pulser):
+    "Trigger every period seconds"
+
+    def __init__(self, period):
+        statemachines.Pulser.__init__(self, period)
+        self.every_ns = int(period * statemachines.SECONDS_PER_NS)
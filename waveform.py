@@ -0,0 +1,130 @@
+# Precomputed flicker waveform, so the per-tick work of a flickering
+# lamp is an index increment and three duty cycle writes.
+#
+# The waveform is a table of (red, green, blue) duty cycles, one row per
+# tick, in an array('H'). It is played as a ring, and every
+# refresh_every'th time playback leaves a chunk of rows the chunk
+# before that one is regenerated (both its neighbours have then been
+# played, see below). So the RAM used is fixed (6 bytes a tick), the
+# cost of generating it is spread thin (one chunk every refresh_every
+# chunks played) and, as long as refresh_every and the number of chunks
+# have no common factor, every chunk is regenerated in turn and the
+# sequence doesn't settle into a loop.
+#
+# The flame model: the level eases towards a target brightness drawn
+# from index_min..index_max, picking a new one every few ticks, and now
+# and then gutters down towards index_bottom. The colour is the level
+# scaled by color per channel, in 256ths (level * c >> 8, so 256 passes
+# the level through unscaled; these aren't 8 bit channel values).
+#
+# So the brightness doesn't jump at chunk boundaries, a chunk carries on
+# from the level the chunk before it in the ring ends at, and when
+# regenerating it changes its own end level the difference is tapered
+# into the first BLEND rows of the chunk after it.
+
+import array
+import random
+
+BLEND = 8
+
+class Waveform:
+    def __init__(self, policy, length=512, chunk=32, refresh_every=5, color=(256, 96, 12)):
+        """policy is a flicker.FlickerPolicy (its index_bottom, index_min
+        and index_max bound the level). length ticks are held, and
+        regenerated chunk ticks at a time. color's elements are
+        multipliers in 256ths, at most 256 (the level unscaled).
+        """
+        if length % chunk:
+            raise ValueError("length must be a multiple of chunk")
+        if length < 3 * chunk:
+            raise ValueError("length must be at least 3 chunks")
+
+        self.bottom = policy.index_bottom
+        self.low = policy.index_min
+        self.high = policy.index_max
+        self.color = color
+
+        self.length = length
+        self.chunk = chunk
+        self.refresh_every = refresh_every
+        self._countdown = refresh_every
+        self.table = array.array('H', (0 for _ in range(3 * length)))
+
+        # The level at the end of each chunk
+        self._ends = array.array('H', (self.low for _ in range(length // chunk)))
+        self._target = self.low
+        self._hold = 0
+
+        self.chunks_generated = 0
+        for n in range(length // chunk):
+            self._generate(n)
+
+        # Playback position (a table index) at which refresh() has to be
+        # called
+        self.next_boundary = 3 * chunk
+
+    def _generate(self, n):
+        # Fill chunk n, carrying on from the end of chunk n - 1
+        table = self.table
+        red, green, blue = self.color
+        ends = self._ends
+        level = ends[n - 1]
+        target = self._target
+        hold = self._hold
+        start = 3 * self.chunk * n
+        for i in range(start, start + 3 * self.chunk, 3):
+            if hold == 0:
+                if random.randint(0, 31) == 0:
+                    target = self.bottom
+                    hold = random.randint(2, 6)
+                else:
+                    target = random.randint(self.low, self.high)
+                    hold = random.randint(3, 10)
+            hold -= 1
+            level += (target - level) >> 2
+            table[i] = level * red >> 8
+            table[i + 1] = level * green >> 8
+            table[i + 2] = level * blue >> 8
+        self._target = target
+        self._hold = hold
+        self.chunks_generated += 1
+
+        after = n + 1
+        if after == len(ends):
+            after = 0
+        self._blend(after, level - ends[n])
+        ends[n] = level
+
+    def _blend(self, n, delta):
+        # Shift the first BLEND rows of chunk n by delta (a level),
+        # tapering off, so they carry on from a changed end of chunk n - 1
+        if delta == 0:
+            return
+        table = self.table
+        red, green, blue = self.color
+        rows = min(BLEND, self.chunk)
+        i = 3 * self.chunk * n
+        for j in range(rows, 0, -1):
+            shift = delta * j // (rows + 1)
+            table[i] = min(max(table[i] + (shift * red >> 8), 0), 0xffff)
+            table[i + 1] = min(max(table[i + 1] + (shift * green >> 8), 0), 0xffff)
+            table[i + 2] = min(max(table[i + 2] + (shift * blue >> 8), 0), 0xffff)
+            i += 3
+
+    def refresh(self, i):
+        """Called when playback reaches next_boundary (i): regenerate the
+        chunk before the one just played if it's time to, and return the
+        (wrapped) index to play next.
+        """
+        size = 3 * self.chunk
+        self._countdown -= 1
+        if self._countdown == 0:
+            self._countdown = self.refresh_every
+            n = i // size - 2
+            if n < 0:
+                n += len(self._ends)
+            self._generate(n)
+        if i == len(self.table):
+            i = 0
+        self.next_boundary = i + size
+        return i